@@ -0,0 +1,107 @@
+from typing import Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+
+from bot.fsm.student import Quiz, Test
+from bot.handlers import setup_routers
+from bot.middlewares.metrics import MetricsMiddleware, RequestMetricsMiddleware
+from bot.middlewares.send_scheduler import SendSchedulerMiddleware
+from bot.services.broadcast import BroadcastEngine
+from bot.services.cache.catalog import CatalogCache
+from bot.services.cache.content import ContentCache
+from bot.services.cache.listener import NotifyListener
+from bot.services.database.cached_storage import CachedStorage
+from bot.services.database.connection import Database
+from bot.services.database.metered_storage import MeteredStorage
+from bot.services.database.storage import PGStorage
+from bot.services.notifier import AdminNotifier
+from bot.services.send_queue import ChatLimiter, PriorityBucket
+from bot.services.tracing import SpanExporter, configure as configure_tracing
+from bot.utils import config
+
+
+async def open_database() -> Database:
+    db = Database(
+        config.DSN,
+        min_size=config.DB_POOL_MIN_SIZE,
+        max_size=config.DB_POOL_MAX_SIZE,
+        acquire_timeout=config.DB_ACQUIRE_TIMEOUT,
+        slow_query_threshold=config.SLOW_QUERY_THRESHOLD,
+    )
+    await db.connect()
+    return db
+
+
+async def start_tracing() -> Optional[SpanExporter]:
+    if not config.TRACE_EXPORT:
+        return None
+    exporter = SpanExporter(config.TRACE_EXPORT)
+    await exporter.start()
+    configure_tracing(exporter, config.TRACE_SAMPLE_RATE)
+    return exporter
+
+
+def create_bot() -> Bot:
+    bot = Bot(token=config.TOKEN)
+    # Worker processes share the bot-wide limit
+    global_rate = config.SEND_GLOBAL_RATE / max(config.BOT_WORKERS, 1)
+    bot.session.middleware(
+        SendSchedulerMiddleware(
+            ChatLimiter(
+                config.SEND_CHAT_RATE, config.SEND_GROUP_RATE, config.SEND_CHAT_BURST
+            ),
+            PriorityBucket(global_rate, burst=max(int(global_rate), 1)),
+            config.SEND_MAX_RETRIES,
+        )
+    )
+    # Registered after the scheduler, so that it times each attempt alone
+    bot.session.middleware(RequestMetricsMiddleware())
+    return bot
+
+
+async def create_dispatcher(
+    db: Database,
+) -> Tuple[Dispatcher, PGStorage, NotifyListener]:
+    """Dispatcher with the FSM storage, caches and every router."""
+    pg_storage = PGStorage(
+        db,
+        ttl=config.FSM_TTL,
+        state_ttls={Test.answer: config.FSM_TEST_TTL, Quiz.answer: config.FSM_TEST_TTL},
+    )
+    await pg_storage.init_tables()
+    if config.WEBHOOK_URL:
+        # Any replica may receive the next update of a user, so state can't
+        # be held back in one process
+        storage = pg_storage
+    else:
+        storage = CachedStorage(
+            pg_storage,
+            max_size=config.FSM_CACHE_SIZE,
+            flush_interval=config.FSM_FLUSH_INTERVAL,
+        )
+
+    dp = Dispatcher(storage=MeteredStorage(storage))
+    dp.message.middleware(MetricsMiddleware())
+    dp.callback_query.middleware(MetricsMiddleware())
+    dp["db"] = db
+    listener = NotifyListener(config.DSN)
+    dp["content"] = ContentCache(db, listener)
+    dp["catalog"] = CatalogCache(db, listener)
+    dp["notifier"] = AdminNotifier(config.ADMIN_IDS)
+    # Forwards still running are sent before the bot session is closed
+    dp.shutdown.register(dp["notifier"].close)
+    dp["broadcasts"] = BroadcastEngine(
+        db,
+        page_size=config.BROADCAST_PAGE_SIZE,
+        concurrency=config.BROADCAST_CONCURRENCY,
+        lease=config.BROADCAST_LEASE,
+        poll_interval=config.BROADCAST_POLL_INTERVAL,
+        retries=config.SEND_MAX_RETRIES,
+    )
+    dp.startup.register(dp["broadcasts"].start)
+    # Hands unfinished broadcasts back while the database is still open
+    dp.shutdown.register(dp["broadcasts"].close)
+    await listener.start()
+
+    dp.include_router(setup_routers())
+    return dp, pg_storage, listener
@@ -22,3 +22,7 @@ class AddQuiz(StatesGroup):
 
 class AddTest(StatesGroup):
     add = State()
+
+
+class Broadcast(StatesGroup):
+    message = State()
@@ -1,11 +1,16 @@
 from aiogram import Router
 
+from bot.middlewares.tracing import TracingMiddleware
+
 
 def setup_routers() -> Router:
     from . import admin, common, students
 
     router = Router()
 
+    router.message.outer_middleware(TracingMiddleware())
+    router.callback_query.outer_middleware(TracingMiddleware())
+
     router.include_routers(
         common.router,
         admin.router,
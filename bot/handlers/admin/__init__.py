@@ -3,6 +3,7 @@ from aiogram import Router
 from bot.middlewares.is_admin import IsAdminMiddleware
 from bot.utils.config import ADMIN_IDS
 
+from .broadcasts import router as broadcasts_router
 from .classes import router as classes_router
 from .lessons import router as lessons_router
 from .materials import router as materials_router
@@ -18,4 +19,5 @@ router.include_routers(
     lessons_router,
     topics_router,
     classes_router,
+    broadcasts_router,
 )
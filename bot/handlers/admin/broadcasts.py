@@ -0,0 +1,99 @@
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+
+from bot.fsm.admin import Broadcast
+from bot.keyboards.inline_keyboard import BroadcastCB, broadcast_kb_generator, cancel_kb
+from bot.services.broadcast import BroadcastEngine
+from bot.services.database.repositories.broadcasts import BroadcastRepository
+
+router = Router()
+
+STATUSES = {"running": "⏳", "done": "✅", "cancelled": "🛑"}
+
+
+@router.message(Command(commands=["broadcast"]))
+async def cmd_broadcast(message: Message):
+    await message.answer(
+        "Розсилка \nКому надіслати повідомлення?",
+        reply_markup=broadcast_kb_generator(),
+    )
+
+
+@router.callback_query(BroadcastCB.filter())
+async def choose_audience(
+    callback: CallbackQuery, callback_data: BroadcastCB, state: FSMContext
+):
+    audience = (
+        f"учням {callback_data.class_number} класу"
+        if callback_data.class_number
+        else "усім учням"
+    )
+    await state.update_data(class_number=callback_data.class_number or None)
+    await state.set_state(Broadcast.message)
+
+    await callback.message.edit_text(
+        f"Розсилка {audience} \nНадішліть повідомлення для розсилки",
+        reply_markup=cancel_kb,
+    )
+    await callback.message.pin()
+
+
+@router.message(Broadcast.message)
+async def receive_broadcast(
+    message: Message, state: FSMContext, db, broadcasts: BroadcastEngine
+):
+    broadcast_repo = BroadcastRepository(db)
+    data = await state.get_data()
+
+    # The message is copied to every recipient, whatever its content type
+    broadcast_id = await broadcast_repo.add_broadcast(
+        data.get("class_number"),
+        from_chat_id=message.chat.id,
+        message_id=message.message_id,
+        created_by=message.from_user.id,
+    )
+    broadcasts.wake()
+    await message.bot.unpin_all_chat_messages(chat_id=message.chat.id)
+
+    await message.answer(
+        f"Розсилку №{broadcast_id} розпочато \n"
+        f"Перевірити стан: /broadcasts \n"
+        f"Зупинити: /cancel_broadcast {broadcast_id}"
+    )
+    await state.clear()
+
+
+@router.message(Command(commands=["broadcasts"]))
+async def cmd_broadcasts(message: Message, db):
+    broadcast_repo = BroadcastRepository(db)
+    broadcasts = await broadcast_repo.get_broadcasts()
+    if not broadcasts:
+        await message.answer("Розсилок ще не було")
+        return
+
+    lines = []
+    for broadcast in broadcasts:
+        audience = (
+            f"{broadcast.class_number} клас" if broadcast.class_number else "усі учні"
+        )
+        lines.append(
+            f"{STATUSES.get(broadcast.status, '')} №{broadcast.id} ({audience}): "
+            f"надіслано {broadcast.sent}, не доставлено {broadcast.failed}"
+        )
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command(commands=["cancel_broadcast"]))
+async def cmd_cancel_broadcast(message: Message, command: CommandObject, db):
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Вкажіть номер розсилки: /cancel_broadcast 1")
+        return
+
+    broadcast_repo = BroadcastRepository(db)
+    broadcast_id = int(command.args)
+    if await broadcast_repo.cancel_broadcast(broadcast_id):
+        await message.answer(f"Розсилку №{broadcast_id} зупинено")
+    else:
+        await message.answer(f"Розсилка №{broadcast_id} не виконується")
@@ -16,8 +16,10 @@ from bot.keyboards.inline_keyboard import (
 )
 from bot.services.database.models import TestData
 from bot.services.database.repositories.lessons import LessonRepository
+from bot.services.database.repositories.quizzes import QuizRepository
 from bot.services.database.repositories.tests import TestRepository
 from bot.services.database.repositories.topics import TopicRepository
+from bot.utils.config import MIN_PASS_SCORE
 
 router = Router()
 
@@ -84,6 +86,9 @@ async def admin_delete_lesson(callback: CallbackQuery, callback_data: LessonCB,
     lesson_repo = LessonRepository(db)
     topic_repo = TopicRepository(db)
     await lesson_repo.delete_lesson(callback_data.lesson_id)  # Assumes method exists
+    await QuizRepository(db).refresh_eligible_topics(
+        MIN_PASS_SCORE, callback_data.topic_id
+    )
     lessons = await lesson_repo.get_lessons_by_topic(callback_data.topic_id)
     topic = await topic_repo.get_topic(callback_data.topic_id)
 
@@ -158,6 +163,10 @@ async def receive_test(message: Message, state: FSMContext, bot: Bot, db):
         lesson_id = data.get("lesson_id")
 
         await test_repo.add_test(lesson_id=lesson_id, test_data=test_data)
+        lesson = await lesson_repo.get_lessson(lesson_id)
+        await QuizRepository(db).refresh_eligible_topics(
+            MIN_PASS_SCORE, lesson.topic_id
+        )
 
         await message.reply(f"Успішно завантажено {len(test_data.questions)} питань!")
 
@@ -169,8 +178,7 @@ async def receive_test(message: Message, state: FSMContext, bot: Bot, db):
         )
         await bot.unpin_all_chat_messages(chat_id=message.from_user.id)
 
-        # Get and display lesson after test is added
-        lesson = await lesson_repo.get_lessson(lesson_id)
+        # Display lesson after test is added
         class_number = await lesson_repo.get_class_by_lesson(lesson_id)
         await message.answer(
             f"Урок: {lesson.title}",
@@ -22,6 +22,7 @@ from bot.services.database.models import QuizData
 from bot.services.database.repositories.lessons import LessonRepository
 from bot.services.database.repositories.quizzes import QuizRepository
 from bot.services.database.repositories.topics import TopicRepository
+from bot.utils.config import MIN_PASS_SCORE
 
 router = Router()
 
@@ -203,6 +204,7 @@ async def receive_quiz(message: Message, state: FSMContext, bot: Bot, db):
         data = await state.get_data()
 
         await quiz_repo.add_quiz(topic_id=data.get("topic_id"), quiz_data=quiz_data)
+        await quiz_repo.refresh_eligible_topics(MIN_PASS_SCORE, data.get("topic_id"))
 
         await message.reply(f"Успішно завантажено {len(quiz_data.questions)} питань!")
 
@@ -11,17 +11,17 @@ from aiogram.types import (
 )
 
 from bot.keyboards.inline_keyboard import LessonCB, ListComands, lesson_kb_generator
-from bot.services.database.repositories.lessons import LessonRepository
+from bot.services.cache.catalog import CatalogCache
 
 router = Router()
 
 
 @router.callback_query(LessonCB.filter(F.cmd == ListComands.open.value))
-async def open_lessons(callback: CallbackQuery, callback_data: LessonCB, db):
-    lesson_repo = LessonRepository(db)
-
-    lesson = await lesson_repo.get_lessson(callback_data.lesson_id)
-    class_number = await lesson_repo.get_class_by_lesson(callback_data.lesson_id)
+async def open_lessons(
+    callback: CallbackQuery, callback_data: LessonCB, catalog: CatalogCache
+):
+    lesson = await catalog.get_lesson(callback_data.lesson_id)
+    class_number = await catalog.get_class_by_lesson(callback_data.lesson_id)
 
     text = f"""
 📝 Урок: {lesson.title}
@@ -42,9 +42,10 @@ async def open_lessons(callback: CallbackQuery, callback_data: LessonCB, db):
 
 
 @router.callback_query(LessonCB.filter(F.cmd == ListComands.get_materials.value))
-async def get_materials(callback: CallbackQuery, callback_data: LessonCB, db):
-    lesson_repo = LessonRepository(db)
-    materials = await lesson_repo.get_materials(callback_data.lesson_id)
+async def get_materials(
+    callback: CallbackQuery, callback_data: LessonCB, catalog: CatalogCache
+):
+    materials = await catalog.get_materials(callback_data.lesson_id)
 
     if not materials:
         await callback.message.answer(
@@ -13,9 +13,8 @@ from bot.keyboards.inline_keyboard import (
     support_kb,
     topics_kb_generator,
 )
-from bot.services.database.repositories.lessons import LessonRepository
+from bot.services.cache.catalog import CatalogCache
 from bot.services.database.repositories.quizzes import QuizRepository
-from bot.services.database.repositories.topics import TopicRepository
 from bot.utils.config import MIN_PASS_SCORE
 
 router = Router()
@@ -65,10 +64,10 @@ async def show_classes(callback: CallbackQuery, callback_data: ProgramCB):
 
 
 @router.callback_query(ClassCB.filter())
-async def show_topics(callback: CallbackQuery, callback_data: ClassCB, db):
-    topic_repo = TopicRepository(db)
-
-    topics = await topic_repo.get_topics_by_class(callback_data.class_number)
+async def show_topics(
+    callback: CallbackQuery, callback_data: ClassCB, catalog: CatalogCache
+):
+    topics = await catalog.get_topics_by_class(callback_data.class_number)
 
     text = f"""📚 {callback_data.class_number}-й клас
 
@@ -83,12 +82,11 @@ async def show_topics(callback: CallbackQuery, callback_data: ClassCB, db):
 
 
 @router.callback_query(TopicCB.filter())
-async def show_lessons(callback: CallbackQuery, callback_data: TopicCB, db):
-    lesson_repo = LessonRepository(db)
-    topic_repo = TopicRepository(db)
-
-    lessons = await lesson_repo.get_lessons_by_topic(callback_data.topic_id)
-    topic = await topic_repo.get_topic(callback_data.topic_id)
+async def show_lessons(
+    callback: CallbackQuery, callback_data: TopicCB, catalog: CatalogCache
+):
+    lessons = await catalog.get_lessons_by_topic(callback_data.topic_id)
+    topic = await catalog.get_topic(callback_data.topic_id)
 
     text = f"""📘 Тема: {topic.title}
 📝 Опис: {topic.description}
@@ -110,7 +108,7 @@ async def show_lessons(callback: CallbackQuery, callback_data: TopicCB, db):
 async def show_quizzes(message: Message, db):
     quiz_repo = QuizRepository(db)
 
-    topics = await quiz_repo.get_eligible_topics(message.from_user.id, MIN_PASS_SCORE)
+    topics = await quiz_repo.get_eligible_topics(message.from_user.id)
 
     if not topics:
         await message.answer("В тебе немає доступних модульних тестів")
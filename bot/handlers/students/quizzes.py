@@ -4,6 +4,7 @@ from aiogram.types import CallbackQuery, InputMediaPhoto, Message
 
 from bot.fsm.student import Quiz
 from bot.keyboards.inline_keyboard import AnswerCB, QuizCB, cancel_kb, question_kb
+from bot.services.cache.content import ContentCache
 from bot.services.database.repositories.quizzes import QuizRepository
 from bot.utils.config import FAIL_PHOTO, MIN_PASS_SCORE, SUCCESS_PHOTO
 
@@ -12,17 +13,28 @@ router = Router()
 
 @router.callback_query(QuizCB.filter())
 async def get_quiz(
-    callback: CallbackQuery, callback_data: QuizCB, state: FSMContext, db
+    callback: CallbackQuery,
+    callback_data: QuizCB,
+    state: FSMContext,
+    content: ContentCache,
 ):
-    quiz_repo = QuizRepository(db)
+    quiz = await content.get_quiz(callback_data.topic_id)
+
+    if not quiz or not quiz.test_data.questions:
+        await callback.answer("Модульний тест відсутній", show_alert=True)
+        return
 
-    question = await quiz_repo.get_question(callback_data.topic_id, 0)
+    questions = quiz.test_data.questions
+    question = questions[0]
 
+    # The session keeps only the answer key, the questions are read from the cache
     await state.set_state(Quiz.answer)
     await state.update_data(
         message_id=callback.message.message_id,
-        correct_answer=question.correct_answer,
-        totoal_questions=1,
+        answers=[question.correct_answer for question in questions],
+        options=[len(question.options) for question in questions],
+        index=0,
+        version=quiz.version,
         correct_questions=0,
         topic_id=callback_data.topic_id,
     )
@@ -42,22 +54,40 @@ async def get_quiz(
 
 @router.callback_query(Quiz.answer, AnswerCB.filter())
 async def answer_question(
-    callback: CallbackQuery, callback_data: AnswerCB, state: FSMContext, bot: Bot, db
+    callback: CallbackQuery,
+    callback_data: AnswerCB,
+    state: FSMContext,
+    bot: Bot,
+    db,
+    content: ContentCache,
 ):
     quiz_repo = QuizRepository(db)
 
     data = await state.get_data()
-    correct_questions = data.get("correct_questions") + (
-        data.get("correct_answer") == callback_data.idx
-    )
-    totoal_questions = data.get("totoal_questions")
+    answers = data.get("answers")
+    index = data.get("index")
     topic_id = data.get("topic_id")
 
-    question = await quiz_repo.get_question(
-        topic_id=topic_id, question_index=totoal_questions
+    # Started before answers were kept in the state
+    if answers is None or data.get("options") is None:
+        await callback.message.edit_text(
+            "Модульний тест було оновлено. Будь ласка, почніть його знову.",
+            reply_markup=None,
+        )
+        await finish_quiz(callback, state, bot, data)
+        return
+
+    if callback_data.idx >= data.get("options")[index]:
+        await callback.answer()
+        return
+
+    correct_questions = data.get("correct_questions") + (
+        answers[index] == callback_data.idx
     )
+    index += 1
+    totoal_questions = len(answers)
 
-    if not question:
+    if index == totoal_questions:
         score = round((correct_questions / totoal_questions) * 100)
         if score >= MIN_PASS_SCORE:
             await quiz_repo.save_student_score(
@@ -85,19 +115,25 @@ async def answer_question(
                 media=InputMediaPhoto(media=FAIL_PHOTO, caption=text), reply_markup=None
             )
 
-        await state.clear()
-        await bot.edit_message_reply_markup(
-            chat_id=callback.from_user.id,
-            message_id=data.get("message_id"),
+        await finish_quiz(callback, state, bot, data)
+        return
+
+    quiz = await content.get_quiz(topic_id)
+
+    # The quiz was replaced by an admin while the student was taking it
+    if not quiz or quiz.version != data.get("version"):
+        await callback.message.edit_text(
+            "Модульний тест було оновлено. Будь ласка, почніть його знову.",
             reply_markup=None,
         )
-        await bot.unpin_all_chat_messages(chat_id=callback.from_user.id)
+        await finish_quiz(callback, state, bot, data)
         return
 
+    question = quiz.get_question(index)
+
     await state.update_data(
-        correct_answer=question.correct_answer,
         correct_questions=correct_questions,
-        totoal_questions=totoal_questions + 1,
+        index=index,
     )
 
     await callback.message.edit_text(
@@ -106,6 +142,16 @@ async def answer_question(
     )
 
 
+async def finish_quiz(callback: CallbackQuery, state: FSMContext, bot: Bot, data):
+    await state.clear()
+    await bot.edit_message_reply_markup(
+        chat_id=callback.from_user.id,
+        message_id=data.get("message_id"),
+        reply_markup=None,
+    )
+    await bot.unpin_all_chat_messages(chat_id=callback.from_user.id)
+
+
 @router.message(Quiz.answer)
 async def except_quiz(message: Message):
     await message.answer("Спочатку закінчіть модульний тест")
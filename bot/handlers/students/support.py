@@ -4,7 +4,7 @@ from aiogram.types import CallbackQuery, Message
 
 from bot.fsm.student import Support
 from bot.keyboards.inline_keyboard import cancel_kb
-from bot.utils.config import ADMIN_IDS
+from bot.services.notifier import AdminNotifier
 
 router = Router()
 
@@ -23,7 +23,11 @@ async def send_bug(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(Support.send)
-async def forvard_bag(message: Message, state: FSMContext, bot: Bot):
+async def forvard_bag(
+    message: Message, state: FSMContext, bot: Bot, notifier: AdminNotifier
+):
+    notifier.forward(bot, message.from_user.id, message.message_id)
+
     data = await state.get_data()
     await bot.edit_message_text(
         text="✅ Ваше повідомлення успішно надіслано адміністраторам.\n"
@@ -33,13 +37,3 @@ async def forvard_bag(message: Message, state: FSMContext, bot: Bot):
         reply_markup=None,
     )
     await state.clear()
-
-    for admin in ADMIN_IDS:
-        try:
-            await bot.forward_message(
-                chat_id=admin,
-                from_chat_id=message.from_user.id,
-                message_id=message.message_id,
-            )
-        except:
-            pass
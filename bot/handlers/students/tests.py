@@ -10,8 +10,8 @@ from bot.keyboards.inline_keyboard import (
     cancel_kb,
     question_kb,
 )
+from bot.services.cache.content import ContentCache
 from bot.services.database.repositories.tests import TestRepository
-from bot.services.database.repositories.topics import TopicRepository
 from bot.utils.config import FAIL_PHOTO, MIN_PASS_SCORE, SUCCESS_PHOTO
 
 router = Router()
@@ -19,21 +19,28 @@ router = Router()
 
 @router.callback_query(LessonCB.filter(F.cmd == ListComands.get_test.value))
 async def get_test(
-    callback: CallbackQuery, callback_data: LessonCB, state: FSMContext, db
+    callback: CallbackQuery,
+    callback_data: LessonCB,
+    state: FSMContext,
+    content: ContentCache,
 ):
-    test_repo = TestRepository(db)
-
-    question = await test_repo.get_question(callback_data.lesson_id, 0)
+    test = await content.get_test(callback_data.lesson_id)
 
-    if not question:
+    if not test or not test.test_data.questions:
         await callback.answer("На жаль, тест ще не доступний", show_alert=True)
         return
 
+    questions = test.test_data.questions
+    question = questions[0]
+
+    # The session keeps only the answer key, the questions are read from the cache
     await state.set_state(Test.answer)
     await state.update_data(
         message_id=callback.message.message_id,
-        correct_answer=question.correct_answer,
-        totoal_questions=1,
+        answers=[question.correct_answer for question in questions],
+        options=[len(question.options) for question in questions],
+        index=0,
+        version=test.version,
         correct_questions=0,
         lesson_id=callback_data.lesson_id,
         topic_id=callback_data.topic_id,
@@ -53,26 +60,47 @@ async def get_test(
 
 @router.callback_query(Test.answer, AnswerCB.filter())
 async def answer_question(
-    callback: CallbackQuery, callback_data: AnswerCB, state: FSMContext, bot: Bot, db
+    callback: CallbackQuery,
+    callback_data: AnswerCB,
+    state: FSMContext,
+    bot: Bot,
+    db,
+    content: ContentCache,
 ):
     test_repo = TestRepository(db)
-    topic_repo = TopicRepository(db)
 
     data = await state.get_data()
-    correct_questions = data.get("correct_questions") + (
-        data.get("correct_answer") == callback_data.idx
-    )
-    totoal_questions = data.get("totoal_questions")
+    answers = data.get("answers")
+    index = data.get("index")
     lesson_id = data.get("lesson_id")
 
-    question = await test_repo.get_question(lesson_id, totoal_questions)
+    # Started before answers were kept in the state
+    if answers is None or data.get("options") is None:
+        await callback.message.edit_text(
+            "Тест було оновлено. Будь ласка, почніть його знову.", reply_markup=None
+        )
+        await finish_test(callback, state, bot, data)
+        return
+
+    if callback_data.idx >= data.get("options")[index]:
+        await callback.answer()
+        return
+
+    correct_questions = data.get("correct_questions") + (
+        answers[index] == callback_data.idx
+    )
+    index += 1
+    totoal_questions = len(answers)
 
     # No more questions
-    if not question:
+    if index == totoal_questions:
         score = round((correct_questions / totoal_questions) * 100)
         if score >= MIN_PASS_SCORE:
-            await test_repo.save_student_score(
-                student_id=callback.from_user.id, lesson_id=lesson_id, score=score
+            _, quiz_unlocked = await test_repo.complete_test(
+                student_id=callback.from_user.id,
+                lesson_id=lesson_id,
+                score=score,
+                min_pass_score=MIN_PASS_SCORE,
             )
 
             text = f"""
@@ -85,11 +113,7 @@ async def answer_question(
                 reply_markup=None,
             )
 
-            if await topic_repo.is_quiz_open(
-                student_id=callback.from_user.id,
-                topic_id=data.get("topic_id"),
-                min_lesson_score=MIN_PASS_SCORE,
-            ):
+            if quiz_unlocked:
                 await callback.message.answer(
                     "🎉 Вітаємо! Ви відкрили модульний тест з теми!\n"
                     "Перейдіть у розділ 'Модульні тести' щоб пройти його."
@@ -106,19 +130,24 @@ async def answer_question(
                 media=InputMediaPhoto(media=FAIL_PHOTO, caption=text), reply_markup=None
             )
 
-        await state.clear()
-        await bot.edit_message_reply_markup(
-            chat_id=callback.from_user.id,
-            message_id=data.get("message_id"),
-            reply_markup=None,
+        await finish_test(callback, state, bot, data)
+        return
+
+    test = await content.get_test(lesson_id)
+
+    # The test was replaced by an admin while the student was taking it
+    if not test or test.version != data.get("version"):
+        await callback.message.edit_text(
+            "Тест було оновлено. Будь ласка, почніть його знову.", reply_markup=None
         )
-        await bot.unpin_all_chat_messages(chat_id=callback.from_user.id)
+        await finish_test(callback, state, bot, data)
         return
 
+    question = test.get_question(index)
+
     await state.update_data(
-        correct_answer=question.correct_answer,
         correct_questions=correct_questions,
-        totoal_questions=totoal_questions + 1,
+        index=index,
     )
 
     await callback.message.edit_text(
@@ -127,6 +156,16 @@ async def answer_question(
     )
 
 
+async def finish_test(callback: CallbackQuery, state: FSMContext, bot: Bot, data):
+    await state.clear()
+    await bot.edit_message_reply_markup(
+        chat_id=callback.from_user.id,
+        message_id=data.get("message_id"),
+        reply_markup=None,
+    )
+    await bot.unpin_all_chat_messages(chat_id=callback.from_user.id)
+
+
 @router.message(Test.answer)
 async def except_test(message: Message):
     await message.answer("Спочатку закінчіть тест")
@@ -1,5 +1,6 @@
 import enum
-from typing import List
+from functools import lru_cache
+from typing import List, Tuple
 
 from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -8,6 +9,10 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from bot.services.database.models import Lesson, TestQuestion, Topic
 from bot.utils.class_range import class_range
 
+# Keyboards below are cached by the content they show, so a renamed or
+# deleted entity produces a new key and the old entry ages out of the cache.
+KEYBOARD_CACHE_SIZE = 4096
+
 use_full_name_kb = InlineKeyboardMarkup(
     inline_keyboard=[
         [
@@ -81,6 +86,29 @@ async def class_kb_generator(start_class: int, end_class: int, admin: bool = Fal
     return keyboard.adjust(1).as_markup()
 
 
+class BroadcastCB(CallbackData, prefix="broadcast"):
+    # 0 sends to every student
+    class_number: int
+
+
+@lru_cache(maxsize=1)
+def broadcast_kb_generator() -> InlineKeyboardMarkup:
+    keyboard = InlineKeyboardBuilder()
+    keyboard.add(
+        InlineKeyboardButton(
+            text="👥 Усім учням", callback_data=BroadcastCB(class_number=0).pack()
+        )
+    )
+    for i in range(1, 12):
+        keyboard.add(
+            InlineKeyboardButton(
+                text=f"{i} Клас", callback_data=BroadcastCB(class_number=i).pack()
+            )
+        )
+    keyboard.add(InlineKeyboardButton(text="🛑Зупинитись", callback_data="cancel"))
+    return keyboard.adjust(1, 3).as_markup()
+
+
 class ListComands(enum.Enum):
     open = 1
     add = 2
@@ -103,14 +131,26 @@ class TopicCB(CallbackData, prefix="topics"):
 
 async def topics_kb_generator(
     topics: List[Topic], class_number: int, cmd: ListComands, admin: bool = False
+):
+    return _topics_kb(
+        tuple((topic.id, topic.title) for topic in topics), class_number, cmd, admin
+    )
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _topics_kb(
+    topics: Tuple[Tuple[int, str], ...],
+    class_number: int,
+    cmd: ListComands,
+    admin: bool,
 ):
     keyboard = InlineKeyboardBuilder()
-    for topic in topics:
+    for topic_id, title in topics:
         keyboard.add(
             InlineKeyboardButton(
-                text=f"📚 {topic.title}",
+                text=f"📚 {title}",
                 callback_data=TopicCB(
-                    topic_id=topic.id, cmd=cmd, admin=admin, class_number=class_number
+                    topic_id=topic_id, cmd=cmd, admin=admin, class_number=class_number
                 ).pack(),
             )
         )
@@ -182,14 +222,31 @@ async def lessons_kb_generator(
     topic_id: int,
     cmd: ListComands,
     admin: bool = False,
+):
+    return _lessons_kb(
+        tuple((lesson.id, lesson.title) for lesson in lessons),
+        class_number,
+        topic_id,
+        cmd,
+        admin,
+    )
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _lessons_kb(
+    lessons: Tuple[Tuple[int, str], ...],
+    class_number: int,
+    topic_id: int,
+    cmd: ListComands,
+    admin: bool,
 ):
     keyboard = InlineKeyboardBuilder()
-    for lesson in lessons:
+    for lesson_id, title in lessons:
         keyboard.add(
             InlineKeyboardButton(
-                text=f"{lesson.title}",
+                text=f"{title}",
                 callback_data=LessonCB(
-                    lesson_id=lesson.id, cmd=cmd, admin=admin, topic_id=topic_id
+                    lesson_id=lesson_id, cmd=cmd, admin=admin, topic_id=topic_id
                 ).pack(),
             )
         )
@@ -256,15 +313,20 @@ async def lessons_kb_generator(
 
 
 async def admin_lesson_kb_generator(lesson: Lesson, class_number: int):
+    return _admin_lesson_kb(lesson.id, lesson.topic_id, class_number)
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _admin_lesson_kb(lesson_id: int, topic_id: int, class_number: int):
     keyboard = InlineKeyboardBuilder()
     keyboard.add(
         InlineKeyboardButton(
             text="📝 Оновити матеріали",
             callback_data=LessonCB(
-                lesson_id=lesson.id,
+                lesson_id=lesson_id,
                 cmd=ListComands.edit,
                 admin=True,
-                topic_id=lesson.topic_id,
+                topic_id=topic_id,
             ).pack(),
         )
     )
@@ -272,10 +334,10 @@ async def admin_lesson_kb_generator(lesson: Lesson, class_number: int):
         InlineKeyboardButton(
             text="✍️ Додати тест",
             callback_data=LessonCB(
-                lesson_id=lesson.id,
+                lesson_id=lesson_id,
                 cmd=ListComands.add_test,
                 admin=True,
-                topic_id=lesson.topic_id,
+                topic_id=topic_id,
             ).pack(),
         )
     )
@@ -283,10 +345,10 @@ async def admin_lesson_kb_generator(lesson: Lesson, class_number: int):
         InlineKeyboardButton(
             text="📋 Переглянути тест",
             callback_data=LessonCB(
-                lesson_id=lesson.id,
+                lesson_id=lesson_id,
                 cmd=ListComands.get_test,
                 admin=True,
-                topic_id=lesson.topic_id,
+                topic_id=topic_id,
             ).pack(),
         )
     )
@@ -294,10 +356,10 @@ async def admin_lesson_kb_generator(lesson: Lesson, class_number: int):
         InlineKeyboardButton(
             text="🗑 Видалити урок",
             callback_data=LessonCB(
-                lesson_id=lesson.id,
+                lesson_id=lesson_id,
                 cmd=ListComands.delete,
                 admin=True,
-                topic_id=lesson.topic_id,
+                topic_id=topic_id,
             ).pack(),
         )
     )
@@ -305,7 +367,7 @@ async def admin_lesson_kb_generator(lesson: Lesson, class_number: int):
         InlineKeyboardButton(
             text="🔙",
             callback_data=TopicCB(
-                topic_id=lesson.topic_id,
+                topic_id=topic_id,
                 cmd=ListComands.open,
                 admin=True,
                 class_number=class_number,
@@ -316,15 +378,20 @@ async def admin_lesson_kb_generator(lesson: Lesson, class_number: int):
 
 
 async def lesson_kb_generator(lesson: Lesson, class_number: int):
+    return _lesson_kb(lesson.id, lesson.topic_id, class_number)
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _lesson_kb(lesson_id: int, topic_id: int, class_number: int):
     keyboard = InlineKeyboardBuilder()
     keyboard.add(
         InlineKeyboardButton(
             text="📚 Отримати навчальні матеріали",
             callback_data=LessonCB(
-                lesson_id=lesson.id,
+                lesson_id=lesson_id,
                 cmd=ListComands.get_materials,
                 admin=False,
-                topic_id=lesson.topic_id,
+                topic_id=topic_id,
             ).pack(),
         )
     )
@@ -332,10 +399,10 @@ async def lesson_kb_generator(lesson: Lesson, class_number: int):
         InlineKeyboardButton(
             text="✍️ Пройти тестування",
             callback_data=LessonCB(
-                lesson_id=lesson.id,
+                lesson_id=lesson_id,
                 cmd=ListComands.get_test,
                 admin=False,
-                topic_id=lesson.topic_id,
+                topic_id=topic_id,
             ).pack(),
         )
     )
@@ -343,7 +410,7 @@ async def lesson_kb_generator(lesson: Lesson, class_number: int):
         InlineKeyboardButton(
             text="🔙",
             callback_data=TopicCB(
-                topic_id=lesson.topic_id,
+                topic_id=topic_id,
                 cmd=ListComands.open,
                 admin=False,
                 class_number=class_number,
@@ -358,6 +425,11 @@ class AnswerCB(CallbackData, prefix="answer"):
 
 
 async def question_kb(answers: List[str]):
+    return _question_kb(tuple(answers))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _question_kb(answers: Tuple[str, ...]):
     keyboard = InlineKeyboardBuilder()
     for idx, answer in enumerate(answers):
         keyboard.add(
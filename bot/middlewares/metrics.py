@@ -0,0 +1,66 @@
+import time
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import CallbackQuery
+
+from bot.services.metrics import (
+    HANDLER_ERRORS,
+    HANDLER_SECONDS,
+    TELEGRAM_ERRORS,
+    TELEGRAM_SECONDS,
+)
+from bot.services.tracing import annotate, span
+
+HANDLERS_PACKAGE = "bot.handlers."
+
+
+def handler_router(data: dict) -> str:
+    """Module of the matched handler relative to bot.handlers, e.g. students.tests."""
+    handler = data.get("handler")
+    module = getattr(getattr(handler, "callback", None), "__module__", "") or ""
+    return module.removeprefix(HANDLERS_PACKAGE) or "unknown"
+
+
+def callback_prefix(event) -> str:
+    """Prefix of the callback data, such as lessons or answer."""
+    if isinstance(event, CallbackQuery) and event.data:
+        return event.data.split(":", 1)[0][:32]
+    return ""
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Time every handler, by router, event type and callback prefix.
+
+    Registered as an inner middleware on the dispatcher, so that it sees
+    the handler that matched.
+    """
+
+    async def __call__(self, handler, event, data):
+        labels = (handler_router(data), type(event).__name__, callback_prefix(event))
+        callback = getattr(data.get("handler"), "callback", None)
+        annotate(handler=f"{labels[0]}.{getattr(callback, '__name__', '')}")
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(*labels)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - start, *labels)
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """Time and trace every Telegram Bot API call made through the bot session."""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            with span(f"telegram {name}"):
+                return await make_request(bot, method)
+        except Exception:
+            TELEGRAM_ERRORS.inc(name)
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - start, name)
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import time
+from itertools import count
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.services.metrics import SEND_DELAY_SECONDS, SEND_QUEUE_DEPTH, SEND_RETRY_AFTER
+from bot.services.send_queue import ChatLimiter, PriorityBucket, current_priority
+
+
+class SendSchedulerMiddleware(BaseRequestMiddleware):
+    """Keep requests to chats within the Telegram flood limits.
+
+    Every request addressed to a chat first waits for a slot of that chat,
+    then for a token of the bot-wide bucket, which goes to interactive
+    requests before bulk ones (see send_queue.bulk). A request answered
+    with retry_after holds back its chat for that long and is sent again,
+    up to max_retries times, so bursts turn into delays instead of errors.
+    """
+
+    def __init__(self, chats: ChatLimiter, bucket: PriorityBucket, max_retries: int):
+        self.chats = chats
+        self.bucket = bucket
+        self.max_retries = max_retries
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or type(method).__name__.startswith("Get"):
+            return await make_request(bot, method)
+
+        priority = current_priority()
+        label = priority.name.lower()
+        for attempt in count():
+            start = time.perf_counter()
+            SEND_QUEUE_DEPTH.inc(label)
+            try:
+                delay = self.chats.delay(chat_id)
+                if delay:
+                    await asyncio.sleep(delay)
+                await self.bucket.acquire(priority)
+            finally:
+                SEND_QUEUE_DEPTH.dec(label)
+            SEND_DELAY_SECONDS.observe(time.perf_counter() - start, label)
+
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                SEND_RETRY_AFTER.inc(type(method).__name__)
+                logging.warning(
+                    f"Flood control in chat {chat_id}, retrying in {e.retry_after}s"
+                )
+                self.chats.pause(chat_id, e.retry_after)
@@ -0,0 +1,20 @@
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+
+from bot.services.tracing import trace
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Open a trace per update.
+
+    FSM storage calls, database queries and Telegram API requests made
+    while the update is handled are recorded as child spans.
+    """
+
+    async def __call__(self, handler, event, data):
+        attributes = {"user_id": event.from_user.id if event.from_user else 0}
+        if isinstance(event, CallbackQuery) and event.data:
+            attributes["callback_data"] = event.data
+
+        with trace(type(event).__name__, **attributes):
+            return await handler(event, data)
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+
+from bot.services.database.models import Broadcast
+from bot.services.database.repositories.broadcasts import BroadcastRepository
+from bot.services.send_queue import bulk, with_retries
+
+
+class BroadcastEngine:
+    """Delivers broadcasts in the background.
+
+    Recipients are read in pages of ``page_size`` students in id order.
+    A page is copied to its recipients concurrently at bulk priority, so
+    the send scheduler paces it at the rate Telegram allows, and its
+    results are saved in one statement with the checkpoint. A broadcast is
+    claimed for ``lease`` seconds at a time, renewed while a page is sent
+    and with every checkpoint, so a broadcast left behind by a stopped
+    process is resumed after its last saved page by whichever process
+    claims it next. Recipients of a page that was in flight may get the
+    message twice.
+    """
+
+    def __init__(
+        self,
+        db,
+        page_size: int = 100,
+        concurrency: int = 20,
+        lease: float = 60,
+        poll_interval: float = 30,
+        retries: int = 3,
+        retry_delay: float = 1,
+    ):
+        self.repo = BroadcastRepository(db)
+        self.page_size = page_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._slots = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+
+    def wake(self):
+        """Look for new broadcasts now instead of at the next poll."""
+        self._wakeup.set()
+
+    async def start(self, bot: Bot):
+        self._task = asyncio.create_task(self._run(bot))
+
+    async def close(self):
+        """Stop after the page each broadcast is on and hand them back."""
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._deliveries:
+            await asyncio.wait(set(self._deliveries))
+
+    async def _run(self, bot: Bot):
+        while True:
+            try:
+                while not self._stopping:
+                    broadcast = await self.repo.claim_broadcast(self.lease)
+                    if broadcast is None:
+                        break
+                    task = asyncio.create_task(self._deliver(bot, broadcast))
+                    self._deliveries.add(task)
+                    task.add_done_callback(self._deliveries.discard)
+            except Exception as e:
+                logging.error(f"Failed to claim broadcasts: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _deliver(self, bot: Bot, broadcast: Broadcast):
+        after = broadcast.last_student_id
+        try:
+            while not self._stopping:
+                recipients = await self.repo.get_recipients(
+                    broadcast.class_number, after, self.page_size
+                )
+                if not recipients:
+                    await self.repo.finish_broadcast(broadcast.id)
+                    logging.info(f"Broadcast {broadcast.id} delivered.")
+                    return
+
+                # Sending a page may take longer than the lease under the
+                # rate limits, another process must not claim it meanwhile
+                renewal = asyncio.create_task(self._renew(broadcast.id))
+                try:
+                    with bulk():
+                        results = await asyncio.gather(
+                            *(
+                                self._send(bot, broadcast, student)
+                                for student in recipients
+                            )
+                        )
+                finally:
+                    renewal.cancel()
+                statuses, errors = zip(*results)
+                saved = await self.repo.save_page(
+                    broadcast.id, recipients, list(statuses), list(errors), self.lease
+                )
+                if not saved:
+                    logging.info(f"Broadcast {broadcast.id} was cancelled.")
+                    return
+                after = recipients[-1]
+
+            await self.repo.release_broadcast(broadcast.id)
+        except Exception as e:
+            # The claim runs out and the broadcast is resumed from its checkpoint
+            logging.error(f"Broadcast {broadcast.id} stopped: {e}")
+
+    async def _renew(self, broadcast_id: int):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.repo.renew_broadcast(broadcast_id, self.lease)
+            except Exception as e:
+                logging.error(f"Failed to renew broadcast {broadcast_id}: {e}")
+
+    async def _send(
+        self, bot: Bot, broadcast: Broadcast, student_id: int
+    ) -> Tuple[str, Optional[str]]:
+        async with self._slots:
+            try:
+                await with_retries(
+                    partial(
+                        bot.copy_message,
+                        chat_id=student_id,
+                        from_chat_id=broadcast.from_chat_id,
+                        message_id=broadcast.message_id,
+                    ),
+                    self.retries,
+                    self.retry_delay,
+                )
+                return "sent", None
+            except TelegramForbiddenError as e:
+                # The student blocked the bot
+                return "blocked", str(e)
+            except Exception as e:
+                return "failed", str(e)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from bisect import insort
+from typing import Dict, List, Optional
+
+from bot.services.cache.listener import NotifyListener
+from bot.services.database.models import Lesson, Material, Topic
+from bot.services.database.repositories.lessons import LessonRepository
+from bot.services.database.repositories.topics import TopicRepository
+from bot.services.tracing import detach
+
+CATALOG_CHANNEL = "catalog_changed"
+
+
+class CatalogCache:
+    """In-memory class -> topic -> lesson -> material tree.
+
+    The whole tree is loaded on first use. Admin mutations in
+    TopicRepository and LessonRepository send a ``catalog_changed``
+    notification with the payload ``topic:<id>``, ``lesson:<id>`` or
+    ``materials:<lesson_id>``, and only that entity is reloaded.
+    """
+
+    def __init__(self, db, listener: NotifyListener):
+        self.db = db
+        self._topics: Dict[int, Topic] = {}
+        self._lessons: Dict[int, Lesson] = {}
+        self._materials: Dict[int, List[Material]] = {}
+        self._topics_by_class: Dict[int, List[int]] = {}
+        self._lessons_by_topic: Dict[int, List[int]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._changes: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        listener.subscribe(CATALOG_CHANNEL, self._changes.put_nowait, self.reset)
+
+    async def get_topics_by_class(self, class_number: int) -> List[Topic]:
+        await self._ensure_loaded()
+        return [
+            self._topics[topic_id]
+            for topic_id in self._topics_by_class.get(class_number, [])
+        ]
+
+    async def get_topic(self, topic_id: int) -> Optional[Topic]:
+        await self._ensure_loaded()
+        return self._topics.get(topic_id)
+
+    async def get_lessons_by_topic(self, topic_id: int) -> List[Lesson]:
+        await self._ensure_loaded()
+        return [
+            self._lessons[lesson_id]
+            for lesson_id in self._lessons_by_topic.get(topic_id, [])
+        ]
+
+    async def get_lesson(self, lesson_id: int) -> Optional[Lesson]:
+        await self._ensure_loaded()
+        return self._lessons.get(lesson_id)
+
+    async def get_class_by_lesson(self, lesson_id: int) -> Optional[int]:
+        await self._ensure_loaded()
+        lesson = self._lessons.get(lesson_id)
+        topic = self._topics.get(lesson.topic_id) if lesson else None
+        return topic.class_number if topic else None
+
+    async def get_materials(self, lesson_id: int) -> List[Material]:
+        await self._ensure_loaded()
+        return list(self._materials.get(lesson_id, []))
+
+    def reset(self):
+        """Drop the tree, it is loaded again on next use."""
+        self._loaded = False
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _ensure_loaded(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._apply_changes())
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self._load()
+
+    async def _load(self):
+        topics = await self.db.fetch("SELECT * FROM topics ORDER BY id")
+        lessons = await self.db.fetch("SELECT * FROM lessons ORDER BY id")
+        materials = await self.db.fetch("SELECT * FROM materials ORDER BY id")
+
+        self._topics = {}
+        self._lessons = {}
+        self._materials = {}
+        self._topics_by_class = {}
+        self._lessons_by_topic = {}
+
+        for row in topics:
+            self._add_topic(Topic(**row))
+        for row in lessons:
+            self._add_lesson(Lesson(**row))
+        for row in materials:
+            material = Material(**row)
+            self._materials.setdefault(material.lesson_id, []).append(material)
+
+        self._loaded = True
+
+    async def _apply_changes(self):
+        # Started by the first lookup, which may be part of a trace
+        detach()
+        # Changes are applied one at a time in the order they were committed
+        while True:
+            payload = await self._changes.get()
+            try:
+                async with self._lock:
+                    if self._loaded:
+                        await self._apply(payload)
+            except Exception as e:
+                logging.error(f"Failed to apply catalog change {payload}: {e}")
+                self.reset()
+
+    async def _apply(self, payload: str):
+        kind, entity_id = payload.split(":")
+        entity_id = int(entity_id)
+
+        if kind == "topic":
+            topic = await TopicRepository(self.db).get_topic(entity_id)
+            if topic:
+                self._add_topic(topic)
+            else:
+                self._remove_topic(entity_id)
+        elif kind == "lesson":
+            lesson = await LessonRepository(self.db).get_lessson(entity_id)
+            if lesson:
+                self._add_lesson(lesson)
+            else:
+                self._remove_lesson(entity_id)
+        elif kind == "materials":
+            materials = await LessonRepository(self.db).get_materials(entity_id)
+            self._materials[entity_id] = materials
+        else:
+            logging.warning(f"Unknown catalog notification: {payload}")
+
+    def _add_topic(self, topic: Topic):
+        old = self._topics.get(topic.id)
+        if old is not None:
+            self._topics_by_class[old.class_number].remove(topic.id)
+        self._topics[topic.id] = topic
+        insort(self._topics_by_class.setdefault(topic.class_number, []), topic.id)
+
+    def _remove_topic(self, topic_id: int):
+        topic = self._topics.pop(topic_id, None)
+        if topic is None:
+            return
+        self._topics_by_class[topic.class_number].remove(topic_id)
+        # Lessons are deleted together with the topic by ON DELETE CASCADE
+        for lesson_id in self._lessons_by_topic.pop(topic_id, []):
+            self._lessons.pop(lesson_id, None)
+            self._materials.pop(lesson_id, None)
+
+    def _add_lesson(self, lesson: Lesson):
+        old = self._lessons.get(lesson.id)
+        if old is not None:
+            self._lessons_by_topic[old.topic_id].remove(lesson.id)
+        self._lessons[lesson.id] = lesson
+        insort(self._lessons_by_topic.setdefault(lesson.topic_id, []), lesson.id)
+
+    def _remove_lesson(self, lesson_id: int):
+        lesson = self._lessons.pop(lesson_id, None)
+        if lesson is None:
+            return
+        self._lessons_by_topic[lesson.topic_id].remove(lesson_id)
+        self._materials.pop(lesson_id, None)
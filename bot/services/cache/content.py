@@ -0,0 +1,68 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+from bot.services.cache.listener import NotifyListener
+from bot.services.database.models import Quiz, Test
+from bot.services.database.repositories.quizzes import QuizRepository
+from bot.services.database.repositories.tests import TestRepository
+
+CONTENT_CHANNEL = "content_changed"
+
+
+class ContentCache:
+    """Process-wide cache of parsed tests and quizzes.
+
+    A test is loaded and validated once and then served from memory for
+    every student taking it. Entries carry the content version and are
+    evicted when an upload in any process sends a ``content_changed``
+    notification with the payload ``test:<lesson_id>:<version>`` or
+    ``quiz:<topic_id>:<version>``.
+    """
+
+    def __init__(self, db, listener: NotifyListener):
+        self.db = db
+        self._tests: Dict[int, Test] = {}
+        self._quizzes: Dict[int, Quiz] = {}
+        # Latest versions announced by notifications, so that a load racing
+        # with an upload does not cache the old document
+        self._versions: Dict[Tuple[str, int], int] = {}
+        listener.subscribe(CONTENT_CHANNEL, self._on_notify, self.clear)
+
+    async def get_test(self, lesson_id: int) -> Optional[Test]:
+        """Get test for a lesson with its content version."""
+        test = self._tests.get(lesson_id)
+        if test is None:
+            test = await TestRepository(self.db).get_test_entry(lesson_id)
+            if test is not None and self._is_current("test", lesson_id, test.version):
+                self._tests[lesson_id] = test
+        return test
+
+    async def get_quiz(self, topic_id: int) -> Optional[Quiz]:
+        """Get quiz for a topic with its content version."""
+        quiz = self._quizzes.get(topic_id)
+        if quiz is None:
+            quiz = await QuizRepository(self.db).get_quiz_entry(topic_id)
+            if quiz is not None and self._is_current("quiz", topic_id, quiz.version):
+                self._quizzes[topic_id] = quiz
+        return quiz
+
+    def clear(self):
+        self._tests.clear()
+        self._quizzes.clear()
+        self._versions.clear()
+
+    def _is_current(self, kind: str, entity_id: int, version: int) -> bool:
+        return version >= self._versions.get((kind, entity_id), 0)
+
+    def _on_notify(self, payload: str):
+        kind, entity_id, version = payload.split(":")
+        entity_id, version = int(entity_id), int(version)
+        entries = {"test": self._tests, "quiz": self._quizzes}.get(kind)
+        if entries is None:
+            logging.warning(f"Unknown content notification: {payload}")
+            return
+
+        self._versions[(kind, entity_id)] = version
+        entry = entries.get(entity_id)
+        if entry is not None and entry.version < version:
+            del entries[entity_id]
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+
+
+class NotifyListener:
+    """Dispatches Postgres NOTIFY payloads to subscribed callbacks.
+
+    Listens on one dedicated connection outside the pool. Notifications
+    sent while the connection was down are lost, so every ``on_reset``
+    callback is called after (re)connecting and caches should drop
+    everything they hold.
+    """
+
+    def __init__(self, dsn: str, reconnect_delay: float = 5.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._callbacks: Dict[str, List[Callable[[str], None]]] = {}
+        self._resets: List[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(
+        self,
+        channel: str,
+        callback: Callable[[str], None],
+        on_reset: Optional[Callable[[], None]] = None,
+    ):
+        self._callbacks.setdefault(channel, []).append(callback)
+        if on_reset is not None:
+            self._resets.append(on_reset)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _dispatch(self, connection, pid, channel: str, payload: str):
+        for callback in self._callbacks.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                logging.error(f"Failed to handle {channel} notification: {e}")
+
+    def _reset(self):
+        for reset in self._resets:
+            try:
+                reset()
+            except Exception as e:
+                logging.error(f"Failed to reset after reconnecting: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self._listen()
+            except Exception as e:
+                logging.error(f"Notify listener failed: {e}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self):
+        """Listen on a new connection until it is lost."""
+        conn = await asyncpg.connect(self.dsn)
+        terminated = asyncio.Event()
+        conn.add_termination_listener(lambda _: terminated.set())
+        try:
+            for channel in self._callbacks:
+                await conn.add_listener(channel, self._dispatch)
+            # Anything may have changed while no connection was listening
+            self._reset()
+            await terminated.wait()
+            logging.warning("Notify listener connection lost, reconnecting.")
+        finally:
+            try:
+                await conn.close()
+            except Exception as e:
+                logging.error(f"Failed to close the notify listener connection: {e}")
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from bot.services.database.storage import PGStorage
+from bot.services.tracing import detach
+
+
+class _Record:
+    __slots__ = ("state", "data", "version", "flushed_version", "touched_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any]):
+        self.state = state
+        self.data = data
+        self.version = 0
+        self.flushed_version = 0
+        # Monotonic time of the last write, or of the load
+        self.touched_at = time.monotonic()
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.flushed_version
+
+
+class CachedStorage(BaseStorage):
+    """Write-back LRU cache in front of PGStorage.
+
+    Reads are served from memory, writes are coalesced per key and flushed
+    to the backing storage every ``flush_interval`` seconds and on close.
+    Only one process may serve updates for a given key, otherwise the
+    processes will overwrite each other's state. Records expire after the
+    TTL of their state, like the rows the janitor deletes.
+    """
+
+    def __init__(
+        self,
+        storage: PGStorage,
+        max_size: int = 10000,
+        flush_interval: float = 1.0,
+    ):
+        self._storage = storage
+        self._max_size = max_size
+        self._flush_interval = flush_interval
+        self._records: "OrderedDict[StorageKey, _Record]" = OrderedDict()
+        self._dirty: Dict[StorageKey, None] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _load(self, key: StorageKey) -> _Record:
+        record = self._records.get(key)
+        if record is not None:
+            if not self._expired(record):
+                self._records.move_to_end(key)
+                return record
+            await self._expire(key)
+
+        state, data = await self._storage.get_record(key)
+
+        # Another coroutine may have loaded the key while we were waiting
+        record = self._records.get(key)
+        if record is None:
+            self._evict(room=1)
+            record = _Record(state, data)
+            self._records[key] = record
+        return record
+
+    def _expired(self, record: _Record) -> bool:
+        ttl = self._storage.ttl_for(record.state)
+        return time.monotonic() - record.touched_at > ttl
+
+    async def _expire(self, key: StorageKey) -> None:
+        """Forget an abandoned record, so it is neither served nor flushed."""
+        self._records.pop(key, None)
+        self._dirty.pop(key, None)
+        await self._storage.delete(key)
+
+    def _evict(self, room: int = 0) -> None:
+        # Dirty records are kept until they are flushed, so the cache may
+        # briefly grow past max_size during a burst of writes.
+        overflow = len(self._records) + room - self._max_size
+        if overflow <= 0:
+            return
+        # Oldest first, each record is looked at once at most
+        for _ in range(len(self._records)):
+            if overflow <= 0:
+                break
+            key, record = self._records.popitem(last=False)
+            if record.dirty:
+                self._records[key] = record
+                continue
+            overflow -= 1
+
+    def _touch(self, key: StorageKey, record: _Record) -> None:
+        record.version += 1
+        record.touched_at = time.monotonic()
+        self._dirty[key] = None
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        # Started by the first write, which may be part of a trace
+        detach()
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"FSM cache flush failed: {e}")
+
+    async def flush(self) -> None:
+        """Write every dirty record to the backing storage."""
+        async with self._flush_lock:
+            for key in list(self._dirty):
+                # Expired or evicted while an earlier record was written
+                record = self._records.get(key)
+                if record is None:
+                    self._dirty.pop(key, None)
+                    continue
+                version = record.version
+                try:
+                    await self._storage.set_record(key, record.state, record.data)
+                except Exception as e:
+                    logging.error(f"Failed to flush FSM record {key}: {e}")
+                    continue
+
+                record.flushed_version = version
+                if not record.dirty:
+                    self._dirty.pop(key, None)
+            self._evict()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._load(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._load(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._load(key)
+        record.data = data.copy()
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._load(key)
+        return record.data.copy()
+
+    async def update_data(
+        self, key: StorageKey, data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        record = await self._load(key)
+        record.data.update(data)
+        self._touch(key, record)
+        return record.data.copy()
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await self._storage.close()
@@ -1,30 +1,289 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence, Tuple, Type, Union
+
 import asyncpg
 
+from bot.services.tracing import span
+
+
+class Row(asyncpg.Record):
+    """Record whose columns can also be read as attributes."""
+
+    def __getattr__(self, name: str):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+@dataclass(frozen=True)
+class Query:
+    name: str
+    sql: str
+    record_class: Optional[Type[asyncpg.Record]] = None
+
+
+# Queries prepared on every pool connection, by name
+QUERIES: Dict[str, Query] = {}
+
+
+def named_query(
+    name: str, sql: str, record_class: Optional[Type[asyncpg.Record]] = None
+) -> Query:
+    """Register a query to be prepared once per connection and run by name."""
+    if name in QUERIES:
+        raise ValueError(f"Query {name} is already registered")
+    query = Query(name, sql, record_class)
+    QUERIES[name] = query
+    return query
+
+
+# prepare_named() fills the statement cache through a private asyncpg method,
+# which is why requirements.txt pins asyncpg to one version
+if not hasattr(asyncpg.Connection, "_get_statement"):
+    raise ImportError(
+        f"asyncpg {asyncpg.__version__} has no Connection._get_statement, "
+        "named queries can't be prepared"
+    )
+
+
+class Connection(asyncpg.Connection):
+    async def prepare_named(self, query: Query):
+        """Prepare a query into the statement cache of the connection.
+
+        execute() and the fetch methods look statements up in that cache by
+        query text and record class, so a prepared query is neither parsed
+        nor planned again on this connection. Statements invalidated by a
+        schema change are prepared again by asyncpg.
+        """
+        await self._get_statement(query.sql, None, record_class=query.record_class)
+
+
+@dataclass
+class PoolStats:
+    acquired: int = 0
+    timeouts: int = 0
+    # Coroutines currently waiting for a connection
+    waiting: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+# Upper bounds of the query latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    errors: int = 0
+    rows: int = 0
+    seconds_total: float = 0.0
+    seconds_max: float = 0.0
+    # Calls per LATENCY_BUCKETS bucket, plus one for slower calls
+    buckets: list = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def observe(self, seconds: float, rows: int = 0, failed: bool = False):
+        self.count += 1
+        self.errors += failed
+        self.rows += rows
+        self.seconds_total += seconds
+        self.seconds_max = max(self.seconds_max, seconds)
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+def query_name(query: Union[str, Query]) -> str:
+    """Name of a named query, or its SQL squeezed onto one line."""
+    if isinstance(query, Query):
+        return query.name
+    return " ".join(query.split())[:80]
+
+
+def redact(args: Sequence[Any]) -> str:
+    """Describe query parameters by type and size only."""
+    described = []
+    for number, value in enumerate(args, 1):
+        kind = type(value).__name__
+        if isinstance(value, (str, bytes, list, tuple, dict)):
+            kind = f"{kind}[{len(value)}]"
+        described.append(f"${number}={kind}")
+    return ", ".join(described)
+
+
+def row_count(method: str, result: Any) -> int:
+    if method == "fetch":
+        return len(result)
+    if method == "execute":
+        # Command status such as "INSERT 0 3" or "DELETE 5"
+        last = result.split()[-1] if result else ""
+        return int(last) if last.isdigit() else 0
+    return int(result is not None)
+
 
 class Database:
-    def __init__(self, dsn: str):
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 5,
+        max_size: int = 10,
+        acquire_timeout: Optional[float] = None,
+        slow_query_threshold: Optional[float] = None,
+    ):
+        """
+        Args:
+            dsn: Connection string
+            min_size: Connections opened up front
+            max_size: Connections the pool may open at most
+            acquire_timeout: Seconds to wait for a free connection before
+                raising asyncio.TimeoutError, None to wait forever
+            slow_query_threshold: Seconds after which a query is logged,
+                None to log none
+        """
         self.pool: asyncpg.Pool | None = None
         self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.slow_query_threshold = slow_query_threshold
+        self.stats = PoolStats()
+        self.query_stats: Dict[str, QueryStats] = {}
 
     async def connect(self):
-        self.pool = await asyncpg.create_pool(dsn=self.dsn, min_size=5, max_size=10)
+        self.pool = await asyncpg.create_pool(
+            dsn=self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            connection_class=Connection,
+            # Room for every named query next to the ad hoc ones
+            statement_cache_size=len(QUERIES) + 100,
+            # Kept for the life of the connection instead of expiring after
+            # five minutes, used or not
+            max_cached_statement_lifetime=0,
+            init=self._prepare_queries,
+        )
 
     async def disconnect(self):
         if self.pool:
             await self.pool.close()
 
-    async def execute(self, query: str, *args):
-        async with self.pool.acquire() as conn:
-            return await conn.execute(query, *args)
+    @asynccontextmanager
+    async def acquire(self):
+        """Acquire a pool connection, recording how long it took."""
+        self.stats.waiting += 1
+        start = time.perf_counter()
+        try:
+            conn = await self.pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.waiting -= 1
+
+        wait = time.perf_counter() - start
+        self.stats.acquired += 1
+        self.stats.wait_seconds_total += wait
+        self.stats.wait_seconds_max = max(self.stats.wait_seconds_max, wait)
+        try:
+            yield conn
+        finally:
+            await self.pool.release(conn)
+
+    def pool_metrics(self) -> Dict[str, Union[int, float]]:
+        """Current pool usage and acquire statistics since start."""
+        size = self.pool.get_size() if self.pool else 0
+        idle = self.pool.get_idle_size() if self.pool else 0
+        return {
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "max_size": self.max_size,
+            "waiting": self.stats.waiting,
+            "acquired": self.stats.acquired,
+            "timeouts": self.stats.timeouts,
+            "wait_seconds_total": self.stats.wait_seconds_total,
+            "wait_seconds_max": self.stats.wait_seconds_max,
+        }
+
+    @staticmethod
+    async def _prepare_queries(conn: Connection):
+        for query in list(QUERIES.values()):
+            try:
+                await conn.prepare_named(query)
+            except asyncpg.PostgresError as e:
+                # Such as a table that is created later. The query is then
+                # prepared by the statement cache when it first runs.
+                logging.warning(f"Failed to prepare query {query.name}: {e}")
+
+    def query_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Latency histogram, row and error counts per query name."""
+        bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+        return {
+            name: {
+                "count": stats.count,
+                "errors": stats.errors,
+                "rows": stats.rows,
+                "seconds_total": stats.seconds_total,
+                "seconds_max": stats.seconds_max,
+                "buckets": dict(zip(bounds, stats.buckets)),
+            }
+            for name, stats in self.query_stats.items()
+        }
+
+    async def _run(self, method: str, query: Union[str, Query], args: Tuple):
+        name = query_name(query)
+        sql = query.sql if isinstance(query, Query) else query
+        kwargs = {}
+        if isinstance(query, Query) and method in ("fetch", "fetchrow"):
+            kwargs["record_class"] = query.record_class
+
+        # The span includes the wait for a pool connection
+        with span(f"db {name}"):
+            async with self.acquire() as conn:
+                start = time.perf_counter()
+                try:
+                    result = await getattr(conn, method)(sql, *args, **kwargs)
+                except Exception:
+                    self._observe(name, time.perf_counter() - start, args, failed=True)
+                    raise
+                self._observe(
+                    name, time.perf_counter() - start, args, row_count(method, result)
+                )
+                return result
+
+    def _observe(
+        self,
+        name: str,
+        seconds: float,
+        args: Tuple,
+        rows: int = 0,
+        failed: bool = False,
+    ):
+        stats = self.query_stats.get(name)
+        if stats is None:
+            stats = self.query_stats[name] = QueryStats()
+        stats.observe(seconds, rows, failed)
+
+        if (
+            self.slow_query_threshold is not None
+            and seconds >= self.slow_query_threshold
+        ):
+            logging.warning(
+                f"Slow query {name} took {seconds:.3f}s with ({redact(args)})"
+            )
+
+    async def execute(self, query: Union[str, Query], *args):
+        return await self._run("execute", query, args)
 
-    async def fetch(self, query: str, *args):
-        async with self.pool.acquire() as conn:
-            return await conn.fetch(query, *args)
+    async def fetch(self, query: Union[str, Query], *args):
+        return await self._run("fetch", query, args)
 
-    async def fetchrow(self, query: str, *args):
-        async with self.pool.acquire() as conn:
-            return await conn.fetchrow(query, *args)
+    async def fetchrow(self, query: Union[str, Query], *args):
+        return await self._run("fetchrow", query, args)
 
-    async def fetchval(self, query: str, *args):
-        async with self.pool.acquire() as conn:
-            return await conn.fetchval(query, *args)
+    async def fetchval(self, query: Union[str, Query], *args):
+        return await self._run("fetchval", query, args)
@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from bot.services.metrics import STORAGE_SECONDS
+from bot.services.tracing import span
+
+
+@contextmanager
+def measure(operation: str):
+    with STORAGE_SECONDS.time(operation), span(f"fsm {operation}"):
+        yield
+
+
+class MeteredStorage(BaseStorage):
+    """Time and trace every operation of the wrapped FSM storage."""
+
+    def __init__(self, storage: BaseStorage):
+        self._storage = storage
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        with measure("set_state"):
+            await self._storage.set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        with measure("get_state"):
+            return await self._storage.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        with measure("set_data"):
+            await self._storage.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        with measure("get_data"):
+            return await self._storage.get_data(key)
+
+    async def update_data(
+        self, key: StorageKey, data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        with measure("update_data"):
+            return await self._storage.update_data(key, data)
+
+    async def close(self) -> None:
+        await self._storage.close()
@@ -59,6 +59,7 @@ class Quiz(BaseModel):
     id: int
     topic_id: int
     test_data: QuizData
+    version: int = 1
 
     @property
     def question_count(self) -> int:
@@ -91,6 +92,7 @@ class Test(BaseModel):
     id: int
     lesson_id: int
     test_data: TestData
+    version: int = 1
 
     @property
     def question_count(self) -> int:
@@ -109,3 +111,16 @@ class TestScore(BaseModel):
     test_id: int
     score: int
     completed_at: datetime
+
+
+class Broadcast(BaseModel):
+    id: int
+    class_number: Optional[int] = Field(alias="class")
+    from_chat_id: int
+    message_id: int
+    created_by: int
+    created_at: datetime
+    status: str
+    last_student_id: int
+    sent: int
+    failed: int
@@ -0,0 +1,171 @@
+from typing import List, Optional
+
+from bot.services.database.connection import named_query
+from bot.services.database.models import Broadcast
+
+CLAIM_BROADCAST = named_query(
+    "broadcasts.claim",
+    """
+    UPDATE broadcasts
+    SET claimed_until = now() + make_interval(secs => $1)
+    WHERE id = (
+        SELECT id
+        FROM broadcasts
+        WHERE status = 'running'
+        AND (claimed_until IS NULL OR claimed_until < now())
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, class, from_chat_id, message_id, created_by, created_at,
+              status, last_student_id, sent, failed
+""",
+)
+
+GET_RECIPIENTS = named_query(
+    "broadcasts.get_recipients",
+    """
+    SELECT s.id
+    FROM students s
+    WHERE s.id > $1
+    AND (
+        $2::int IS NULL
+        OR EXISTS (
+            SELECT 1
+            FROM student_best_scores b
+            JOIN tests ts ON ts.id = b.test_id
+            JOIN lessons l ON l.id = ts.lesson_id
+            JOIN topics t ON t.id = l.topic_id
+            WHERE b.student_id = s.id AND b.test_id IS NOT NULL AND t.class = $2
+        )
+        OR EXISTS (
+            SELECT 1
+            FROM student_best_scores b
+            JOIN quizzes q ON q.id = b.quiz_id
+            JOIN topics t ON t.id = q.topic_id
+            WHERE b.student_id = s.id AND b.quiz_id IS NOT NULL AND t.class = $2
+        )
+    )
+    ORDER BY s.id
+    LIMIT $3
+""",
+)
+
+SAVE_PAGE = named_query(
+    "broadcasts.save_page",
+    """
+    WITH delivered AS (
+        INSERT INTO broadcast_deliveries (broadcast_id, student_id, status, error)
+        SELECT $1, *
+        FROM unnest($2::bigint[], $3::text[], $4::text[])
+        ON CONFLICT (broadcast_id, student_id) DO NOTHING
+        RETURNING status
+    )
+    UPDATE broadcasts
+    SET last_student_id = $5,
+        sent = sent + (SELECT count(*) FROM delivered WHERE status = 'sent'),
+        failed = failed + (SELECT count(*) FROM delivered WHERE status <> 'sent'),
+        claimed_until = now() + make_interval(secs => $6)
+    WHERE id = $1 AND status = 'running'
+    RETURNING status
+""",
+)
+
+
+class BroadcastRepository:
+    def __init__(self, db):
+        self.db = db
+
+    async def add_broadcast(
+        self,
+        class_number: Optional[int],
+        from_chat_id: int,
+        message_id: int,
+        created_by: int,
+    ) -> int:
+        query = """
+            INSERT INTO broadcasts (class, from_chat_id, message_id, created_by)
+            VALUES ($1, $2, $3, $4)
+            RETURNING id
+        """
+        return await self.db.fetchval(
+            query, class_number, from_chat_id, message_id, created_by
+        )
+
+    async def get_broadcasts(self, limit: int = 5) -> List[Broadcast]:
+        query = """
+            SELECT id, class, from_chat_id, message_id, created_by, created_at,
+                   status, last_student_id, sent, failed
+            FROM broadcasts
+            ORDER BY id DESC
+            LIMIT $1
+        """
+        rows = await self.db.fetch(query, limit)
+        return [Broadcast(**dict(row)) for row in rows]
+
+    async def claim_broadcast(self, lease: float) -> Optional[Broadcast]:
+        """Take a running broadcast no other process is delivering, for
+        ``lease`` seconds."""
+        result = await self.db.fetchrow(CLAIM_BROADCAST, lease)
+        return Broadcast(**dict(result)) if result else None
+
+    async def get_recipients(
+        self, class_number: Optional[int], after_student_id: int, limit: int
+    ) -> List[int]:
+        """Next page of recipients, by student id."""
+        rows = await self.db.fetch(
+            GET_RECIPIENTS, after_student_id, class_number, limit
+        )
+        return [row["id"] for row in rows]
+
+    async def save_page(
+        self,
+        broadcast_id: int,
+        student_ids: List[int],
+        statuses: List[str],
+        errors: List[Optional[str]],
+        lease: float,
+    ) -> bool:
+        """Record the results of a page and move the checkpoint past it,
+        renewing the claim. Returns False when the broadcast was cancelled."""
+        status = await self.db.fetchval(
+            SAVE_PAGE,
+            broadcast_id,
+            student_ids,
+            statuses,
+            errors,
+            max(student_ids),
+            lease,
+        )
+        return status is not None
+
+    async def renew_broadcast(self, broadcast_id: int, lease: float):
+        """Extend the claim on a broadcast by ``lease`` seconds from now."""
+        query = """
+            UPDATE broadcasts
+            SET claimed_until = now() + make_interval(secs => $2)
+            WHERE id = $1 AND status = 'running'
+        """
+        return await self.db.execute(query, broadcast_id, lease)
+
+    async def finish_broadcast(self, broadcast_id: int):
+        query = """
+            UPDATE broadcasts
+            SET status = 'done', finished_at = now(), claimed_until = NULL
+            WHERE id = $1 AND status = 'running'
+        """
+        return await self.db.execute(query, broadcast_id)
+
+    async def release_broadcast(self, broadcast_id: int):
+        """Let any process resume the broadcast right away."""
+        query = "UPDATE broadcasts SET claimed_until = NULL WHERE id = $1"
+        return await self.db.execute(query, broadcast_id)
+
+    async def cancel_broadcast(self, broadcast_id: int) -> bool:
+        query = """
+            UPDATE broadcasts
+            SET status = 'cancelled', finished_at = now(), claimed_until = NULL
+            WHERE id = $1 AND status = 'running'
+        """
+        result = await self.db.execute(query, broadcast_id)
+        return result == "UPDATE 1"
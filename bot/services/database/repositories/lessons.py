@@ -11,13 +11,22 @@ class LessonRepository:
 
     async def add_lesson(self, title: str, description: str, topic_id: int):
         query = """
-            INSERT INTO lessons (title, description, topic_id)
-            VALUES ($1, $2, $3)
+            WITH inserted AS (
+                INSERT INTO lessons (title, description, topic_id)
+                VALUES ($1, $2, $3)
+                RETURNING id
+            )
+            SELECT pg_notify('catalog_changed', 'lesson:' || id) FROM inserted
         """
         return await self.db.execute(query, title, description, topic_id)
 
     async def delete_lesson(self, lesson_id: int):
-        query = "DELETE FROM lessons WHERE id = $1"
+        query = """
+            WITH deleted AS (
+                DELETE FROM lessons WHERE id = $1 RETURNING id
+            )
+            SELECT pg_notify('catalog_changed', 'lesson:' || id) FROM deleted
+        """
         return await self.db.execute(query, lesson_id)
 
     async def get_lessson(self, lesson_id: int) -> Optional[Lesson]:
@@ -41,8 +50,11 @@ class LessonRepository:
 
     async def add_material(self, lesson_id: int, file_id: str, file_type: str):
         query = """
-            INSERT INTO materials (lesson_id, file_id, type)
-            VALUES ($1, $2, $3)
+            WITH inserted AS (
+                INSERT INTO materials (lesson_id, file_id, type)
+                VALUES ($1, $2, $3)
+            )
+            SELECT pg_notify('catalog_changed', 'materials:' || $1)
         """
         return await self.db.execute(query, lesson_id, file_id, file_type)
 
@@ -52,5 +64,10 @@ class LessonRepository:
         return [Material(**dict(row)) for row in rows]
 
     async def delete_materials(self, lesson_id: int):
-        query = "DELETE FROM materials WHERE lesson_id = $1"
+        query = """
+            WITH deleted AS (
+                DELETE FROM materials WHERE lesson_id = $1
+            )
+            SELECT pg_notify('catalog_changed', 'materials:' || $1)
+        """
         return await self.db.execute(query, lesson_id)
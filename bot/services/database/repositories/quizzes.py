@@ -1,7 +1,77 @@
 import json
-from typing import Dict, List, Optional
+from typing import List, Optional
 
-from bot.services.database.models import QuizData, QuizQuestion, Topic
+from bot.services.database.connection import Row, named_query
+from bot.services.database.models import Quiz, QuizData, Topic
+
+GET_QUIZ_ENTRY = named_query(
+    "quizzes.get_quiz_entry",
+    """
+    SELECT id, topic_id, version, test_data::text
+    FROM quizzes
+    WHERE topic_id = $1
+""",
+    Row,
+)
+
+SAVE_STUDENT_SCORE = named_query(
+    "quizzes.save_student_score",
+    """
+    WITH saved AS (
+        INSERT INTO student_scores (
+            student_id,
+            quiz_id,
+            score,
+            completed_at
+        )
+        SELECT $1, id, $3, CURRENT_TIMESTAMP
+        FROM quizzes
+        WHERE topic_id = $2
+        RETURNING id, student_id, quiz_id, score, completed_at
+    ), best AS (
+        INSERT INTO student_best_scores (
+            student_id, quiz_id, score_id, score, completed_at
+        )
+        SELECT student_id, quiz_id, id, score, completed_at
+        FROM saved
+        ON CONFLICT (student_id, quiz_id) WHERE quiz_id IS NOT NULL
+        DO UPDATE SET score_id = EXCLUDED.score_id,
+                      score = EXCLUDED.score,
+                      completed_at = EXCLUDED.completed_at
+        WHERE EXCLUDED.score >= student_best_scores.score
+    ), taken AS (
+        DELETE FROM student_eligible_quizzes
+        WHERE student_id = $1 AND topic_id = $2
+        AND EXISTS (SELECT 1 FROM saved)
+    )
+    SELECT id FROM saved
+""",
+)
+
+GET_ELIGIBLE_TOPICS = named_query(
+    "quizzes.get_eligible_topics",
+    """
+    SELECT t.id, t.title, t.description, t.class
+    FROM student_eligible_quizzes e
+    JOIN topics t ON t.id = e.topic_id
+    WHERE e.student_id = $1
+    ORDER BY t.id
+""",
+)
+
+GET_STUDENT_HIGHEST_SCORE = named_query(
+    "quizzes.get_student_highest_score",
+    """
+    SELECT
+        b.score,
+        b.completed_at
+    FROM student_best_scores b
+    JOIN quizzes q ON b.quiz_id = q.id
+    WHERE b.student_id = $1
+    AND q.topic_id = $2
+""",
+    Row,
+)
 
 
 class QuizRepository:
@@ -21,100 +91,102 @@ class QuizRepository:
             return QuizData.model_validate(data)
         return None
 
+    async def get_quiz_entry(self, topic_id: int) -> Optional[Quiz]:
+        """Get quiz for a topic together with its id and content version."""
+        result = await self.db.fetchrow(GET_QUIZ_ENTRY, topic_id)
+        if result:
+            return Quiz(
+                id=result.id,
+                topic_id=result.topic_id,
+                version=result.version,
+                test_data=QuizData.model_validate_json(result.test_data),
+            )
+        return None
+
     async def add_quiz(self, topic_id: int, quiz_data: QuizData) -> int:
-        """Add or update quiz for a topic. Returns quiz ID."""
+        """Add or update quiz for a topic. Returns quiz ID.
+
+        Bumps the quiz version and notifies every process caching it.
+        """
         query = """
-            INSERT INTO quizzes (topic_id, test_data)
-            VALUES ($1, $2::jsonb)
-            ON CONFLICT ON CONSTRAINT unique_topic_quiz
-            DO UPDATE SET test_data = $2::jsonb
-            RETURNING id
+            WITH saved AS (
+                INSERT INTO quizzes (topic_id, test_data)
+                VALUES ($1, $2::jsonb)
+                ON CONFLICT ON CONSTRAINT unique_topic_quiz
+                DO UPDATE SET test_data = $2::jsonb, version = quizzes.version + 1
+                RETURNING id, version
+            )
+            SELECT id, pg_notify('content_changed', 'quiz:' || $1 || ':' || version)
+            FROM saved
         """
         json_data = quiz_data.model_dump_json()
         return await self.db.fetchval(query, topic_id, json_data)
 
-    async def get_question(
-        self, topic_id: int, question_index: int
-    ) -> Optional[QuizQuestion]:
-        """Get a specific question from a topic's quiz."""
-        query = """
-            SELECT (test_data->'questions'->$2::int)
-            FROM quizzes 
-            WHERE topic_id = $1
-        """
-        result = await self.db.fetchval(query, topic_id, question_index)
-        if result:
-            data = json.loads(result)
-            return QuizQuestion.model_validate(data)
-        return None
-
     async def save_student_score(
         self, student_id: int, topic_id: int, score: int
     ) -> int:
-        """Save student's quiz score."""
-        # First get quiz_id for the topic
-        quiz_id = await self.db.fetchval(
-            "SELECT id FROM quizzes WHERE topic_id = $1", topic_id
+        """Save student's quiz score, update their best score for the quiz and
+        remove the quiz from their eligible ones."""
+        score_id = await self.db.fetchval(
+            SAVE_STUDENT_SCORE, student_id, topic_id, score
         )
-        if not quiz_id:
+        if not score_id:
             raise ValueError("No quiz found for this topic")
+        return score_id
 
-        query = """
-            INSERT INTO student_scores (
-                student_id, 
-                quiz_id, 
-                score, 
-                completed_at
-            )
-            VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
-            RETURNING id
-        """
-        return await self.db.fetchval(query, student_id, quiz_id, score)
-
-    async def get_eligible_topics(
-        self, student_id: int, min_lesson_score: int
-    ) -> List[Topic]:
+    async def get_eligible_topics(self, student_id: int) -> List[Topic]:
         """Returns a list of topics where the student can take the quiz."""
+        results = await self.db.fetch(GET_ELIGIBLE_TOPICS, student_id)
+
+        return [Topic(**row) for row in results]
+
+    async def refresh_eligible_topics(
+        self, min_lesson_score: int, topic_id: Optional[int] = None
+    ):
+        """Recompute the eligible quizzes of every student, for one topic or
+        for all of them. Needed after curriculum edits or a change of the
+        pass score, scores and registrations keep the set up to date on
+        their own."""
         query = """
-            SELECT t.id, t.title, t.description, t.class
-            FROM topics t
-            JOIN quizzes q ON t.id = q.topic_id
-            WHERE NOT EXISTS (
-                -- Check if the student failed any test in this topic
-                SELECT 1 FROM lessons l
-                JOIN tests tst ON l.id = tst.lesson_id
-                LEFT JOIN student_scores s ON tst.id = s.test_id AND s.student_id = $1
-                WHERE l.topic_id = t.id
-                GROUP BY l.id, tst.id
-                HAVING COALESCE(MAX(s.score), 0) < $2
+            WITH eligible AS (
+                SELECT s.id AS student_id, q.topic_id
+                FROM students s
+                CROSS JOIN quizzes q
+                WHERE ($2::int IS NULL OR q.topic_id = $2)
+                AND NOT EXISTS (
+                    -- Check if the student failed or missed any test in this topic
+                    SELECT 1 FROM lessons l
+                    JOIN tests tst ON l.id = tst.lesson_id
+                    LEFT JOIN student_best_scores b
+                        ON tst.id = b.test_id AND b.student_id = s.id
+                    WHERE l.topic_id = q.topic_id
+                    AND COALESCE(b.score, 0) < $1
+                )
+                AND NOT EXISTS (
+                    -- Check if the student has already taken the quiz
+                    SELECT 1 FROM student_best_scores bq
+                    WHERE bq.quiz_id = q.id AND bq.student_id = s.id
+                )
+            ), removed AS (
+                DELETE FROM student_eligible_quizzes e
+                WHERE ($2::int IS NULL OR e.topic_id = $2)
+                AND NOT EXISTS (
+                    SELECT 1 FROM eligible el
+                    WHERE el.student_id = e.student_id AND el.topic_id = e.topic_id
+                )
             )
-            AND NOT EXISTS (
-                -- Check if the student has already taken the quiz
-                SELECT 1 FROM student_scores sq
-                WHERE sq.quiz_id = q.id AND sq.student_id = $1
-            );
+            INSERT INTO student_eligible_quizzes (student_id, topic_id)
+            SELECT student_id, topic_id FROM eligible
+            ON CONFLICT DO NOTHING
         """
-        results = await self.db.fetch(query, student_id, min_lesson_score)
-
-        return [Topic(**row) for row in results]
+        return await self.db.execute(query, min_lesson_score, topic_id)
 
     async def get_student_highest_score(
         self, student_id: int, topic_id: int
-    ) -> Optional[Dict]:
+    ) -> Optional[Row]:
         """
         Get student's highest score for a topic's quiz.
-        Returns dict with score and completion date, or None if no attempts.
-        """
-        query = """
-            SELECT 
-                s.score,
-                s.completed_at
-            FROM student_scores s
-            JOIN quizzes q ON s.quiz_id = q.id
-            WHERE s.student_id = $1 
-            AND q.topic_id = $2
-            ORDER BY s.score DESC
-            LIMIT 1
+        Returns row with score and completion date, or None if no attempts.
         """
-        result = await self.db.fetchrow(query, student_id, topic_id)
-        return dict(result) if result else None
+        result = await self.db.fetchrow(GET_STUDENT_HIGHEST_SCORE, student_id, topic_id)
+        return result
@@ -1,22 +1,44 @@
 from typing import Optional
 
+from bot.services.database.connection import named_query
 from bot.services.database.models import Student
 
+ADD_STUDENT = named_query(
+    "students.add_student",
+    """
+    WITH added AS (
+        INSERT INTO students (id, name, username)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id
+    )
+    -- A new student has no scores, so only the quizzes of topics without
+    -- tests are open to them
+    INSERT INTO student_eligible_quizzes (student_id, topic_id)
+    SELECT a.id, q.topic_id
+    FROM added a
+    CROSS JOIN quizzes q
+    WHERE NOT EXISTS (
+        SELECT 1 FROM lessons l
+        JOIN tests tst ON l.id = tst.lesson_id
+        WHERE l.topic_id = q.topic_id
+    )
+""",
+)
+
+GET_STUDENT = named_query(
+    "students.get_student", "SELECT * FROM students WHERE id = $1"
+)
+
 
 class StudentRepository:
     def __init__(self, db):
         self.db = db
 
     async def add_student(self, student_id: int, name: str, username: str):
-        query = """
-            INSERT INTO students (id, name, username)
-            VALUES ($1, $2, $3)
-            ON CONFLICT (id) DO NOTHING
-        """
-
-        return await self.db.execute(query, student_id, name, username)
+        """Register a student, with the quizzes that are open from the start."""
+        return await self.db.execute(ADD_STUDENT, student_id, name, username)
 
     async def get_student(self, student_id: int) -> Optional[Student]:
-        query = "SELECT * FROM students WHERE id = $1"
-        result = await self.db.fetchrow(query, student_id)
+        result = await self.db.fetchrow(GET_STUDENT, student_id)
         return Student(**result) if result else None
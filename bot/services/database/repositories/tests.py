@@ -1,36 +1,98 @@
 import json
-from typing import Dict, Optional
+from typing import Optional, Tuple
 
-from bot.services.database.models import TestData, TestQuestion
+from bot.services.database.connection import Row, named_query
+from bot.services.database.models import Test, TestData
 
+GET_TEST_ENTRY = named_query(
+    "tests.get_test_entry",
+    """
+    SELECT id, lesson_id, version, test_data::text
+    FROM tests
+    WHERE lesson_id = $1
+""",
+    Row,
+)
 
-class TestRepository:
-    def __init__(self, db):
-        self.db = db
+COMPLETE_TEST = named_query(
+    "tests.complete_test",
+    """
+    WITH test AS (
+        SELECT tst.id, l.topic_id
+        FROM tests tst
+        JOIN lessons l ON l.id = tst.lesson_id
+        WHERE tst.lesson_id = $2
+    ), saved AS (
+        INSERT INTO student_scores (
+            student_id,
+            test_id,
+            score,
+            completed_at
+        )
+        SELECT $1, id, $3, CURRENT_TIMESTAMP
+        FROM test
+        RETURNING id, student_id, test_id, score, completed_at
+    ), best AS (
+        INSERT INTO student_best_scores (
+            student_id, test_id, score_id, score, completed_at
+        )
+        SELECT student_id, test_id, id, score, completed_at
+        FROM saved
+        ON CONFLICT (student_id, test_id) WHERE test_id IS NOT NULL
+        DO UPDATE SET score_id = EXCLUDED.score_id,
+                      score = EXCLUDED.score,
+                      completed_at = EXCLUDED.completed_at
+        WHERE EXCLUDED.score >= student_best_scores.score
+    ), unlocked AS (
+        -- Sees best scores from before this attempt, so this test is
+        -- checked by $3 and excluded from the topic check
+        INSERT INTO student_eligible_quizzes (student_id, topic_id)
+        SELECT $1, test.topic_id
+        FROM test
+        WHERE $3 >= $4
+        AND EXISTS (
+            SELECT 1 FROM quizzes q
+            WHERE q.topic_id = test.topic_id
+            AND NOT EXISTS (
+                SELECT 1 FROM student_best_scores bq
+                WHERE bq.quiz_id = q.id AND bq.student_id = $1
+            )
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM lessons l
+            JOIN tests tst ON l.id = tst.lesson_id
+            LEFT JOIN student_best_scores b
+                ON tst.id = b.test_id AND b.student_id = $1
+            WHERE l.topic_id = test.topic_id
+            AND tst.id <> test.id
+            AND COALESCE(b.score, 0) < $4
+        )
+        ON CONFLICT DO NOTHING
+        RETURNING topic_id
+    )
+    SELECT saved.id, EXISTS (SELECT 1 FROM unlocked) AS quiz_unlocked
+    FROM saved
+""",
+)
 
-    async def get_question(
-        self, lesson_id: int, question_index: int
-    ) -> Optional[TestQuestion]:
-        """Get a specific question from a lesson's test.
+GET_STUDENT_HIGHEST_SCORE = named_query(
+    "tests.get_student_highest_score",
+    """
+    SELECT
+        b.score,
+        b.completed_at
+    FROM student_best_scores b
+    JOIN tests t ON b.test_id = t.id
+    WHERE b.student_id = $1
+    AND t.lesson_id = $2
+""",
+    Row,
+)
 
-        Args:
-            lesson_id: The ID of the lesson
-            question_index: Zero-based index of the question to retrieve
 
-        Returns:
-            TestQuestion object if found, None otherwise
-        """
-        query = """
-            SELECT (test_data->'questions'->$2::int)
-            FROM tests 
-            WHERE lesson_id = $1
-        """
-        result = await self.db.fetchval(query, lesson_id, question_index)
-        if result:
-            if isinstance(result, str):
-                result = json.loads(result)
-            return TestQuestion.model_validate(result)
-        return None
+class TestRepository:
+    def __init__(self, db):
+        self.db = db
 
     async def get_test(self, lesson_id: int) -> Optional[TestData]:
         """Get full test data for a lesson."""
@@ -45,58 +107,61 @@ class TestRepository:
             return TestData.model_validate(data)
         return None
 
+    async def get_test_entry(self, lesson_id: int) -> Optional[Test]:
+        """Get test for a lesson together with its id and content version."""
+        result = await self.db.fetchrow(GET_TEST_ENTRY, lesson_id)
+        if result:
+            return Test(
+                id=result.id,
+                lesson_id=result.lesson_id,
+                version=result.version,
+                test_data=TestData.model_validate_json(result.test_data),
+            )
+        return None
+
     async def add_test(self, lesson_id: int, test_data: TestData) -> int:
-        """Add or update test for a lesson. Returns test ID."""
+        """Add or update test for a lesson. Returns test ID.
+
+        Bumps the test version and notifies every process caching it.
+        """
         query = """
-            INSERT INTO tests (lesson_id, test_data)
-            VALUES ($1, $2::jsonb)
-            ON CONFLICT (lesson_id) DO UPDATE
-            SET test_data = $2::jsonb
-            RETURNING id
+            WITH saved AS (
+                INSERT INTO tests (lesson_id, test_data)
+                VALUES ($1, $2::jsonb)
+                ON CONFLICT (lesson_id) DO UPDATE
+                SET test_data = $2::jsonb, version = tests.version + 1
+                RETURNING id, version
+            )
+            SELECT id, pg_notify('content_changed', 'test:' || $1 || ':' || version)
+            FROM saved
         """
         json_data = test_data.model_dump_json()
         return await self.db.fetchval(query, lesson_id, json_data)
 
-    async def save_student_score(
-        self, student_id: int, lesson_id: int, score: int
-    ) -> int:
-        """Save student's test score."""
-        # First get test_id for the lesson
-        test_id = await self.db.fetchval(
-            "SELECT id FROM tests WHERE lesson_id = $1", lesson_id
-        )
-        if not test_id:
-            raise ValueError("No test found for this lesson")
+    async def complete_test(
+        self, student_id: int, lesson_id: int, score: int, min_pass_score: int
+    ) -> Tuple[int, bool]:
+        """Save student's test score and check whether it unlocked a quiz.
 
-        query = """
-            INSERT INTO student_scores (
-                student_id, 
-                test_id, 
-                score, 
-                completed_at
-            )
-            VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
-            RETURNING id
+        Returns the score ID and whether this attempt opened the topic's
+        quiz: the test is passed now, every other test in the topic is
+        passed and the quiz was not eligible or taken before.
         """
-        return await self.db.fetchval(query, student_id, test_id, score)
+        result = await self.db.fetchrow(
+            COMPLETE_TEST, student_id, lesson_id, score, min_pass_score
+        )
+        if not result:
+            raise ValueError("No test found for this lesson")
+        return result["id"], result["quiz_unlocked"]
 
     async def get_student_highest_score(
         self, student_id: int, lesson_id: int
-    ) -> Optional[Dict]:
+    ) -> Optional[Row]:
         """
         Get student's highest score for a lesson's test.
-        Returns dict with score and completion date, or None if no attempts.
-        """
-        query = """
-            SELECT 
-                s.score,
-                s.completed_at
-            FROM student_scores s
-            JOIN tests t ON s.test_id = t.id
-            WHERE s.student_id = $1 
-            AND t.lesson_id = $2
-            ORDER BY s.score DESC
-            LIMIT 1
+        Returns row with score and completion date, or None if no attempts.
         """
-        result = await self.db.fetchrow(query, student_id, lesson_id)
-        return dict(result) if result else None
+        result = await self.db.fetchrow(
+            GET_STUDENT_HIGHEST_SCORE, student_id, lesson_id
+        )
+        return result
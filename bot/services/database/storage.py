@@ -1,85 +1,253 @@
+import asyncio
 import json
-from typing import Optional, Union
+import logging
+from typing import Dict, Optional, Tuple, Union
 
-import asyncpg
 from aiogram.fsm.state import State
 from aiogram.fsm.storage.base import BaseStorage, StorageKey
 
+from bot.services.database.connection import Database, named_query
+
+KEY_COLUMNS = "bot_id, chat_id, user_id, thread_id, business_connection_id, destiny"
+KEY_MATCH = """
+    bot_id = $1 AND chat_id = $2 AND user_id = $3 AND thread_id = $4
+    AND business_connection_id = $5 AND destiny = $6
+"""
+
+
+def key_args(key: StorageKey) -> tuple:
+    """Convert a StorageKey to the values of the aiogram_fsm key columns."""
+    return (
+        key.bot_id,
+        key.chat_id,
+        key.user_id,
+        key.thread_id or 0,
+        key.business_connection_id or "",
+        key.destiny,
+    )
+
+
+CLEAR_STATE = named_query(
+    "fsm.clear_state",
+    f"""
+    WITH removed AS (
+        DELETE FROM aiogram_fsm
+        WHERE {KEY_MATCH} AND data = '{{}}'
+        RETURNING 1
+    )
+    UPDATE aiogram_fsm
+    SET state = NULL, updated_at = now()
+    WHERE {KEY_MATCH} AND NOT EXISTS (SELECT 1 FROM removed);
+""",
+)
+
+SET_STATE = named_query(
+    "fsm.set_state",
+    f"""
+    INSERT INTO aiogram_fsm({KEY_COLUMNS}, state)
+    VALUES($1, $2, $3, $4, $5, $6, $7)
+    ON CONFLICT ({KEY_COLUMNS})
+    DO UPDATE SET state = EXCLUDED.state, updated_at = now();
+""",
+)
+
+GET_STATE = named_query(
+    "fsm.get_state", f"SELECT state FROM aiogram_fsm WHERE {KEY_MATCH};"
+)
+
+CLEAR_DATA = named_query(
+    "fsm.clear_data",
+    f"""
+    WITH removed AS (
+        DELETE FROM aiogram_fsm
+        WHERE {KEY_MATCH} AND state IS NULL
+        RETURNING 1
+    )
+    UPDATE aiogram_fsm
+    SET data = '{{}}', updated_at = now()
+    WHERE {KEY_MATCH} AND NOT EXISTS (SELECT 1 FROM removed);
+""",
+)
+
+SET_DATA = named_query(
+    "fsm.set_data",
+    f"""
+    INSERT INTO aiogram_fsm({KEY_COLUMNS}, data)
+    VALUES($1, $2, $3, $4, $5, $6, $7::jsonb)
+    ON CONFLICT ({KEY_COLUMNS})
+    DO UPDATE SET data = EXCLUDED.data, updated_at = now();
+""",
+)
+
+GET_DATA = named_query(
+    "fsm.get_data", f"SELECT data FROM aiogram_fsm WHERE {KEY_MATCH};"
+)
+
+UPDATE_DATA = named_query(
+    "fsm.update_data",
+    f"""
+    INSERT INTO aiogram_fsm({KEY_COLUMNS}, data)
+    VALUES($1, $2, $3, $4, $5, $6, $7::jsonb)
+    ON CONFLICT ({KEY_COLUMNS})
+    DO UPDATE SET data = aiogram_fsm.data || EXCLUDED.data,
+                  updated_at = now()
+    RETURNING data;
+""",
+)
+
+GET_RECORD = named_query(
+    "fsm.get_record", f"SELECT state, data FROM aiogram_fsm WHERE {KEY_MATCH};"
+)
+
+SET_RECORD = named_query(
+    "fsm.set_record",
+    f"""
+    INSERT INTO aiogram_fsm({KEY_COLUMNS}, state, data)
+    VALUES($1, $2, $3, $4, $5, $6, $7, $8::jsonb)
+    ON CONFLICT ({KEY_COLUMNS})
+    DO UPDATE SET state = EXCLUDED.state,
+                  data = EXCLUDED.data,
+                  updated_at = now();
+""",
+)
+
+DELETE = named_query("fsm.delete", f"DELETE FROM aiogram_fsm WHERE {KEY_MATCH};")
+
+DELETE_EXPIRED = named_query(
+    "fsm.delete_expired",
+    f"""
+    DELETE FROM aiogram_fsm
+    WHERE ({KEY_COLUMNS}) IN (
+        SELECT {KEY_COLUMNS}
+        FROM aiogram_fsm f
+        LEFT JOIN unnest($1::text[], $2::int[]) AS t(state, ttl)
+            ON t.state = f.state
+        WHERE f.updated_at < now() - make_interval(secs => COALESCE(t.ttl, $3))
+        LIMIT $4
+    );
+""",
+)
+
 
 class PGStorage(BaseStorage):
-    def __init__(self, pool: asyncpg.Pool):
-        self._pool = pool
+    def __init__(
+        self,
+        db: Database,
+        ttl: int = 7 * 24 * 3600,
+        state_ttls: Optional[Dict[Union[str, State], int]] = None,
+    ):
+        """
+        Args:
+            db: Database with a connected pool
+            ttl: Seconds after the last write before a record expires
+            state_ttls: Per-state overrides of ttl
+        """
+        self._db = db
+        self._ttl = ttl
+        self._state_ttls = {
+            (state if isinstance(state, str) else state.state): state_ttl
+            for state, state_ttl in (state_ttls or {}).items()
+        }
+
+    def ttl_for(self, state: Optional[str]) -> int:
+        """Seconds after the last write before a record in state expires."""
+        return self._state_ttls.get(state, self._ttl)
 
     async def init_tables(self):
-        async with self._pool.acquire() as conn:
-            await conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS aiogram_states (
-                    key TEXT PRIMARY KEY,
-                    state TEXT
-                );
+        await self._db.execute(
             """
-            )
-            await conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS aiogram_data (
-                    key TEXT PRIMARY KEY,
-                    data JSONB
-                );
-            """
-            )
+            CREATE TABLE IF NOT EXISTS aiogram_fsm (
+                bot_id BIGINT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                thread_id BIGINT NOT NULL DEFAULT 0,
+                business_connection_id TEXT NOT NULL DEFAULT '',
+                destiny TEXT NOT NULL DEFAULT 'default',
+                state TEXT,
+                data JSONB NOT NULL DEFAULT '{}',
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (
+                    bot_id, chat_id, user_id,
+                    thread_id, business_connection_id, destiny
+                )
+            );
+        """
+        )
 
     async def set_state(
         self, key: StorageKey, state: Optional[Union[str, State]] = None
     ) -> None:
         state_value = state if isinstance(state, (str, type(None))) else state.state
-        async with self._pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO aiogram_states(key, state)
-                VALUES($1, $2)
-                ON CONFLICT (key)
-                DO UPDATE SET state = EXCLUDED.state;
-            """,
-                str(key),
-                state_value,
-            )
+        if state_value is None:
+            # Drop the row instead of keeping an empty one around
+            await self._db.execute(CLEAR_STATE, *key_args(key))
+            return
+
+        await self._db.execute(SET_STATE, *key_args(key), state_value)
 
     async def get_state(self, key: StorageKey) -> Optional[str]:
-        async with self._pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT state FROM aiogram_states WHERE key = $1;", str(key)
-            )
-            return row["state"] if row else None
+        return await self._db.fetchval(GET_STATE, *key_args(key))
 
     async def set_data(self, key: StorageKey, data: dict) -> None:
-        data_json = json.dumps(data)
-        async with self._pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO aiogram_data(key, data)
-                VALUES($1, $2::jsonb)
-                ON CONFLICT (key)
-                DO UPDATE SET data = EXCLUDED.data;
-            """,
-                str(key),
-                data_json,
-            )
+        if not data:
+            await self._db.execute(CLEAR_DATA, *key_args(key))
+            return
+
+        await self._db.execute(SET_DATA, *key_args(key), json.dumps(data))
 
     async def get_data(self, key: StorageKey) -> dict:
-        async with self._pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT data FROM aiogram_data WHERE key = $1;", str(key)
-            )
-            return json.loads(row["data"]) if row else {}
+        result = await self._db.fetchval(GET_DATA, *key_args(key))
+        return json.loads(result) if result else {}
 
     async def update_data(self, key: StorageKey, data: dict) -> dict:
-        current = await self.get_data(key)
-        current.update(data)
-        await self.set_data(key, current)
-        return current
+        result = await self._db.fetchval(UPDATE_DATA, *key_args(key), json.dumps(data))
+        return json.loads(result)
+
+    async def get_record(self, key: StorageKey) -> Tuple[Optional[str], dict]:
+        """Read state and data for a key in one query."""
+        row = await self._db.fetchrow(GET_RECORD, *key_args(key))
+        return (row["state"], json.loads(row["data"])) if row else (None, {})
+
+    async def set_record(
+        self, key: StorageKey, state: Optional[str], data: dict
+    ) -> None:
+        """Write state and data for a key in one statement."""
+        if state is None and not data:
+            await self.delete(key)
+            return
+
+        await self._db.execute(SET_RECORD, *key_args(key), state, json.dumps(data))
+
+    async def delete(self, key: StorageKey) -> None:
+        await self._db.execute(DELETE, *key_args(key))
+
+    async def delete_expired(self, batch_size: int = 1000) -> int:
+        """Delete records whose state TTL has passed. Returns deleted count."""
+        states = list(self._state_ttls)
+        ttls = [self._state_ttls[state] for state in states]
+
+        deleted = 0
+        while True:
+            result = await self._db.execute(
+                DELETE_EXPIRED, states, ttls, self._ttl, batch_size
+            )
+            count = int(result.split()[-1])
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    async def run_janitor(self, interval: float, batch_size: int = 1000) -> None:
+        """Periodically delete expired records, until cancelled."""
+        while True:
+            try:
+                deleted = await self.delete_expired(batch_size)
+                if deleted:
+                    logging.info(f"Deleted {deleted} expired FSM records.")
+            except Exception as e:
+                logging.error(f"FSM janitor failed: {e}")
+            await asyncio.sleep(interval)
 
     async def close(self) -> None:
-        # If you want PGStorage to handle closing, you can call pool.close()
-        # Otherwise, manage your pool lifecycle externally.
-        await self._pool.close()
+        # The pool is closed by its owner, after the shutdown handlers that
+        # still use it
+        pass
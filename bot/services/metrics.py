@@ -0,0 +1,241 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from bot.services.database.connection import LATENCY_BUCKETS, Database
+
+# Metrics of this process, rendered in the order they were created
+REGISTRY: List["Metric"] = []
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label values: calls per bucket (plus one for slower calls) and sum
+        self.values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, seconds: float, *labels: str):
+        counts, total = self.values.setdefault(
+            labels, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        counts[bisect_left(self.buckets, seconds)] += 1
+        total[0] += seconds
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, (counts, total) in self.values.items():
+            lines.extend(
+                render_histogram(
+                    self.name, self.labelnames, labels, self.buckets, counts, total[0]
+                )
+            )
+        return lines
+
+
+def render_histogram(
+    name: str,
+    labelnames: Sequence[str],
+    labels: Sequence[str],
+    buckets: Sequence[float],
+    counts: Sequence[int],
+    total: float,
+) -> List[str]:
+    """Sample lines of one histogram series from non-cumulative bucket counts."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip([*map(str, buckets), "+Inf"], counts):
+        cumulative += count
+        bucket_labels = format_labels((*labelnames, "le"), (*labels, bound))
+        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+    series = format_labels(labelnames, labels)
+    lines.append(f"{name}_sum{series} {total}")
+    lines.append(f"{name}_count{series} {cumulative}")
+    return lines
+
+
+def render_database(db: Database) -> List[str]:
+    lines = []
+    for key, value in db.pool_metrics().items():
+        kind = (
+            "counter"
+            if key in ("acquired", "timeouts", "wait_seconds_total")
+            else "gauge"
+        )
+        name = f"db_pool_{key}"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+
+    lines.append(
+        "# HELP db_query_seconds Time spent running a query on its connection."
+    )
+    lines.append("# TYPE db_query_seconds histogram")
+    for query, stats in db.query_stats.items():
+        lines.extend(
+            render_histogram(
+                "db_query_seconds",
+                ("query",),
+                (query,),
+                LATENCY_BUCKETS,
+                stats.buckets,
+                stats.seconds_total,
+            )
+        )
+    for name, field in (
+        ("db_query_rows_total", "rows"),
+        ("db_query_errors_total", "errors"),
+    ):
+        lines.append(f"# TYPE {name} counter")
+        for query, stats in db.query_stats.items():
+            series = format_labels(("query",), (query,))
+            lines.append(f"{name}{series} {getattr(stats, field)}")
+    return lines
+
+
+def render(db: Optional[Database] = None) -> str:
+    """Metrics of this process in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    if db is not None:
+        lines.extend(render_database(db))
+    return "\n".join(lines) + "\n"
+
+
+async def start_server(db: Optional[Database], host: str, port: int) -> web.AppRunner:
+    """Serve the metrics of this process at /metrics.
+
+    For bot processes that don't run the web app, which serves them
+    otherwise. Stop it with ``cleanup()`` on the returned runner.
+    """
+
+    async def get_metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            text=render(db), headers={"Content-Type": "text/plain; version=0.0.4"}
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", get_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds",
+    "Time spent in aiogram handlers.",
+    ("router", "event", "prefix"),
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total",
+    "Exceptions raised by aiogram handlers.",
+    ("router", "event", "prefix"),
+)
+STORAGE_SECONDS = Histogram(
+    "bot_fsm_storage_seconds",
+    "Time spent in FSM storage operations.",
+    ("operation",),
+)
+TELEGRAM_SECONDS = Histogram(
+    "bot_telegram_request_seconds",
+    "Latency of Telegram Bot API calls.",
+    ("method",),
+)
+TELEGRAM_ERRORS = Counter(
+    "bot_telegram_request_errors_total",
+    "Telegram Bot API calls that failed.",
+    ("method",),
+)
+WEB_SECONDS = Histogram(
+    "web_request_seconds",
+    "Latency of web server requests.",
+    ("method", "route", "status"),
+)
+SEND_QUEUE_DEPTH = Gauge(
+    "bot_send_queue_depth",
+    "Telegram requests waiting for the rate limits.",
+    ("priority",),
+)
+SEND_DELAY_SECONDS = Histogram(
+    "bot_send_delay_seconds",
+    "Time Telegram requests waited for the rate limits.",
+    ("priority",),
+)
+SEND_RETRY_AFTER = Counter(
+    "bot_send_retry_after_total",
+    "Telegram requests retried after hitting flood control.",
+    ("method",),
+)
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from functools import partial
+from typing import List, Set
+
+from aiogram import Bot
+
+from bot.services.send_queue import bulk, with_retries
+from bot.services.tracing import detach
+
+
+class AdminNotifier:
+    """Forwards messages to every admin in the background.
+
+    Forwards run concurrently and at bulk priority, so they never hold up
+    the handler that started them or the replies to students.
+    """
+
+    def __init__(self, admin_ids: List[int], retries: int = 3, retry_delay: float = 1):
+        self.admin_ids = admin_ids
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._tasks: Set[asyncio.Task] = set()
+
+    def forward(self, bot: Bot, from_chat_id: int, message_id: int):
+        task = asyncio.create_task(self._forward_all(bot, from_chat_id, message_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Wait for the forwards that are still running."""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks))
+
+    async def _forward_all(self, bot: Bot, from_chat_id: int, message_id: int):
+        # Runs on after the handler's trace was exported
+        detach()
+        with bulk():
+            results = await asyncio.gather(
+                *(
+                    with_retries(
+                        partial(
+                            bot.forward_message,
+                            chat_id=admin_id,
+                            from_chat_id=from_chat_id,
+                            message_id=message_id,
+                        ),
+                        self.retries,
+                        self.retry_delay,
+                    )
+                    for admin_id in self.admin_ids
+                ),
+                return_exceptions=True,
+            )
+        for admin_id, result in zip(self.admin_ids, results):
+            if isinstance(result, Exception):
+                logging.error(
+                    f"Failed to forward message {message_id} to admin {admin_id}: "
+                    f"{result}"
+                )
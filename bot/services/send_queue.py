@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from heapq import heappop, heappush
+from itertools import count
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+
+T = TypeVar("T")
+
+# Failures worth sending again, flood control is retried by the scheduler
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+_priority: ContextVar[Priority] = ContextVar(
+    "send_priority", default=Priority.INTERACTIVE
+)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def bulk():
+    """Send the Telegram requests made inside the block after interactive ones."""
+    token = _priority.set(Priority.BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class ChatLimiter:
+    """Token bucket per chat, kept as the time its next request is due (GCRA).
+
+    Private chats get ``rate`` requests per second, groups and channels
+    ``group_rate``, both with bursts of up to ``burst`` requests.
+    """
+
+    def __init__(
+        self, rate: float, group_rate: float, burst: int, max_chats: int = 10000
+    ):
+        self._limits = {
+            False: (1 / rate, (burst - 1) / rate),
+            True: (1 / group_rate, (burst - 1) / group_rate),
+        }
+        self._max_chats = max_chats
+        self._due: Dict[Union[int, str], float] = {}
+
+    def delay(self, chat_id: Union[int, str]) -> float:
+        """Reserve the next slot of a chat and return how long to wait for it."""
+        now = time.monotonic()
+        interval, tolerance = self._limits[self._is_group(chat_id)]
+        due = max(self._due.get(chat_id, now), now)
+        self._due[chat_id] = due + interval
+        if len(self._due) > self._max_chats:
+            self._forget_idle(now)
+        return max(0.0, due - tolerance - now)
+
+    def pause(self, chat_id: Union[int, str], seconds: float):
+        """Hold back the requests of a chat for the given time."""
+        _, tolerance = self._limits[self._is_group(chat_id)]
+        due = time.monotonic() + seconds + tolerance
+        self._due[chat_id] = max(self._due.get(chat_id, 0.0), due)
+
+    @staticmethod
+    def _is_group(chat_id: Union[int, str]) -> bool:
+        # Group and channel ids are negative, channels may also be @names
+        return not isinstance(chat_id, int) or chat_id < 0
+
+    def _forget_idle(self, now: float):
+        # A chat whose bucket is full again needs no entry
+        self._due = {chat: due for chat, due in self._due.items() if due > now}
+
+
+class PriorityBucket:
+    """Token bucket shared by all chats that serves waiting requests by
+    priority, interactive ones first, then in arrival order."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = count()
+        self._task: Optional[asyncio.Task] = None
+
+    async def acquire(self, priority: Priority):
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heappush(self._waiters, (priority, next(self._order), future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._grant())
+        await future
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def _grant(self):
+        while self._waiters:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            _, _, future = heappop(self._waiters)
+            # Waiters that were cancelled meanwhile don't take a token
+            if not future.done():
+                self._tokens -= 1
+                future.set_result(None)
+
+
+async def with_retries(
+    send: Callable[[], Awaitable[T]], retries: int, retry_delay: float
+) -> T:
+    """Call send, and again after a doubling delay while it fails transiently."""
+    for attempt in range(retries + 1):
+        try:
+            return await send()
+        except TRANSIENT_ERRORS as e:
+            if attempt == retries:
+                raise
+            delay = retry_delay * 2**attempt
+            logging.warning(f"Telegram request failed, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+# Span of the code currently running, None outside of a sampled trace
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_exporter: Optional["SpanExporter"] = None
+_sample_rate = 1.0
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    # Finished spans of the whole trace, shared by all its spans
+    finished: List["Span"] = field(default_factory=list)
+
+
+def new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def configure(exporter: Optional["SpanExporter"], sample_rate: float = 1.0):
+    """Send traces to exporter, or stop tracing when it is None."""
+    global _exporter, _sample_rate
+    _exporter = exporter
+    _sample_rate = sample_rate
+
+
+def annotate(**attributes):
+    """Add attributes to the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def detach():
+    """Leave the current trace for the rest of the running task.
+
+    A task copies the context it was created in, so a background task
+    started while handling an update would otherwise keep adding spans to
+    that update's trace after it was exported.
+    """
+    _current.set(None)
+
+
+@contextmanager
+def _activate(current: Span):
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        current.finished.append(current)
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    """Start a new trace, sampled at the configured rate."""
+    if _exporter is None or random.random() >= _sample_rate:
+        yield None
+        return
+
+    root = Span(new_id(16), new_id(8), None, name, time.time_ns(), 0, attributes)
+    try:
+        with _activate(root):
+            yield root
+    finally:
+        _exporter.export(root.finished)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a child of the current span. Does nothing outside of a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(
+        parent.trace_id,
+        new_id(8),
+        parent.span_id,
+        name,
+        time.time_ns(),
+        attributes=attributes,
+        finished=parent.finished,
+    )
+    with _activate(child):
+        yield child
+
+
+def attribute_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Span], service_name: str) -> dict:
+    """Spans in the OTLP/JSON trace export format."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": service_name}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [
+                            {
+                                "traceId": s.trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_id or "",
+                                "name": s.name,
+                                # SPAN_KIND_SERVER for the update, INTERNAL below
+                                "kind": 2 if s.parent_id is None else 1,
+                                "startTimeUnixNano": str(s.start_ns),
+                                "endTimeUnixNano": str(s.end_ns),
+                                "attributes": [
+                                    {"key": key, "value": attribute_value(value)}
+                                    for key, value in s.attributes.items()
+                                ],
+                                "status": (
+                                    {"code": 2, "message": s.error}
+                                    if s.error
+                                    else {"code": 1}
+                                ),
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """Exports finished traces in the background.
+
+    ``target`` is either the URL of an OTLP/HTTP collector, to which
+    traces are posted at ``/v1/traces``, or the path of a file to which
+    every trace is appended as one line of OTLP/JSON.
+    """
+
+    def __init__(
+        self, target: str, service_name: str = "learn_bot", max_queue: int = 1000
+    ):
+        self.target = target
+        self.service_name = service_name
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def export(self, spans: List[Span]):
+        try:
+            self._queue.put_nowait(spans)
+        except asyncio.QueueFull:
+            # Tracing must never hold up handling updates
+            pass
+
+    async def start(self):
+        if self.target.startswith(("http://", "https://")):
+            self._session = aiohttp.ClientSession()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run(self):
+        while True:
+            spans = await self._queue.get()
+            payload = to_otlp(spans, self.service_name)
+            try:
+                if self._session is not None:
+                    url = self.target.rstrip("/") + "/v1/traces"
+                    async with self._session.post(url, json=payload) as response:
+                        response.raise_for_status()
+                else:
+                    await asyncio.to_thread(self._append, json.dumps(payload))
+            except Exception as e:
+                logging.error(f"Failed to export trace: {e}")
+
+    def _append(self, line: str):
+        with open(self.target, "a") as file:
+            file.write(line + "\n")
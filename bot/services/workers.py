@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from functools import partial
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
+
+from bot.services import metrics
+from bot.utils import config
+
+
+def update_user_id(update: Update) -> int:
+    """Id of the user an update comes from, 0 if it has none."""
+    try:
+        event = update.event
+    except UpdateTypeLookupError:
+        return 0
+    user = getattr(event, "from_user", None) or getattr(event, "user", None)
+    return user.id if user else 0
+
+
+class OrderedFeeder:
+    """Feeds updates to a dispatcher concurrently, but the updates of each
+    user one at a time and in the order they arrived."""
+
+    def __init__(self, dp: Dispatcher, bot: Bot):
+        self.dp = dp
+        self.bot = bot
+        # Last update task of each user, the next one waits for it
+        self._tails: Dict[int, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def feed(self, update: Update):
+        user_id = update_user_id(update)
+        task = asyncio.create_task(self._handle(update, self._tails.get(user_id)))
+        self._tails[user_id] = task
+        self._tasks.add(task)
+        task.add_done_callback(partial(self._done, user_id))
+
+    async def drain(self):
+        """Wait until every update fed so far is handled."""
+        while self._tasks:
+            await asyncio.wait(set(self._tasks))
+
+    async def _handle(self, update: Update, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logging.error(f"Failed to handle update {update.update_id}: {e}")
+
+    def _done(self, user_id: int, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._tails.get(user_id) is task:
+            del self._tails[user_id]
+
+
+class WorkerPool:
+    """Bot worker processes, each handling the updates of a share of users.
+
+    Updates are routed by user id, so the FSM state of a user is only ever
+    touched by one worker and the write-back storage cache stays valid.
+    ``feed_update`` has the signature of ``Dispatcher.feed_update``, so
+    the pool can stand in for the dispatcher of the webhook route.
+    """
+
+    def __init__(self, size: int):
+        context = multiprocessing.get_context("spawn")
+        self._queues = [context.Queue() for _ in range(size)]
+        self._processes = [
+            context.Process(
+                target=run_worker, args=(index, queue), name=f"bot-worker-{index}"
+            )
+            for index, queue in enumerate(self._queues)
+        ]
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+
+    async def feed_update(self, bot: Bot, update: Update):
+        queue = self._queues[update_user_id(update) % len(self._queues)]
+        queue.put(update.model_dump_json(exclude_unset=True, by_alias=True))
+
+    async def close(self, timeout: float):
+        """Let workers finish the updates they were sent, then stop them."""
+        for queue in self._queues:
+            queue.put(None)
+        await asyncio.to_thread(self._join, timeout)
+
+    def _join(self, timeout: float):
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logging.warning(f"{process.name} did not drain in time, terminating")
+                process.terminate()
+                process.join()
+
+
+def run_worker(index: int, queue: multiprocessing.Queue):
+    logging.basicConfig(level=logging.INFO)
+    # Ctrl+C reaches the whole process group, the launcher decides when
+    # workers stop by closing their queue
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(serve_worker(index, queue))
+
+
+async def serve_worker(index: int, queue: multiprocessing.Queue):
+    from bot.bootstrap import (
+        create_bot,
+        create_dispatcher,
+        open_database,
+        start_tracing,
+    )
+
+    db = await open_database()
+    exporter = await start_tracing()
+    dp, pg_storage, listener = await create_dispatcher(db)
+    bot = create_bot()
+    feeder = OrderedFeeder(dp, bot)
+    # Handler, storage and query metrics are recorded here, not in the launcher
+    metrics_server = await metrics.start_server(
+        db, config.METRICS_HOST, config.METRICS_PORT + 1 + index
+    )
+    # Expired FSM records only need to be deleted by one process
+    janitor_task: Optional[asyncio.Task] = None
+    if index == 0:
+        janitor_task = asyncio.create_task(
+            pg_storage.run_janitor(config.FSM_JANITOR_INTERVAL)
+        )
+
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    logging.info(f"Bot worker {index} started.")
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            payload = await loop.run_in_executor(None, queue.get)
+            if payload is None:
+                break
+            feeder.feed(Update.model_validate_json(payload, context={"bot": bot}))
+        await feeder.drain()
+    finally:
+        if janitor_task is not None:
+            janitor_task.cancel()
+        await listener.close()
+        await dp["catalog"].close()
+        # Flushes the FSM storage and stops the broadcasts
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await bot.session.close()
+        await metrics_server.cleanup()
+        await db.disconnect()
+        if exporter is not None:
+            await exporter.close()
+        logging.info(f"Bot worker {index} stopped.")
+
+
+async def poll_updates(bot: Bot, pool: WorkerPool, allowed_updates: List[str]):
+    """Long poll Telegram and hand every update to the pool, until cancelled."""
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset, timeout=30, allowed_updates=allowed_updates
+            )
+        except Exception as e:
+            logging.error(f"Failed to get updates: {e}")
+            await asyncio.sleep(5)
+            continue
+
+        for update in updates:
+            await pool.feed_update(bot, update)
+            offset = update.update_id + 1
@@ -6,7 +6,54 @@ load_dotenv()
 
 TOKEN = os.getenv("BOT_TOKEN")
 DSN = os.getenv("DATABASE_URL")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 5))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", 10))
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", 0.5))
+# File path or OTLP/HTTP collector URL to export traces to, empty to disable
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+# Public base URL of the web server, empty to use long polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", 100))
+# Seconds to wait on shutdown for updates that were already acknowledged
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 30))
+# Bot worker processes, updates are sharded between them by user id
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", 1))
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", 30))
+# Outbound Telegram requests per second, for the whole bot, one chat and one group
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 1))
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", 20 / 60))
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", 3))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", 3))
+# Broadcasts: recipients per checkpoint, copies in flight, seconds a claim lasts
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", 100))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 20))
+BROADCAST_LEASE = float(os.getenv("BROADCAST_LEASE", 60))
+BROADCAST_POLL_INTERVAL = float(os.getenv("BROADCAST_POLL_INTERVAL", 30))
+# Serve the web app from the bot process, 0 when it runs as its own service
+WEB_EMBEDDED = os.getenv("WEB_EMBEDDED", "1") == "1"
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", 8000))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 2))
+WEB_DB_POOL_MIN_SIZE = int(os.getenv("WEB_DB_POOL_MIN_SIZE", 2))
+WEB_DB_POOL_MAX_SIZE = int(os.getenv("WEB_DB_POOL_MAX_SIZE", 10))
+# /metrics of a bot process that doesn't serve the web app. Bot worker N
+# serves its own at METRICS_PORT + 1 + N
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
 ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_IDS").split(",")]
 MIN_PASS_SCORE = int(os.getenv("MIN_PASS_SCORE", 60))
 SUCCESS_PHOTO = os.getenv("SUCCESS_PHOTO")
 FAIL_PHOTO = os.getenv("FAIL_PHOTO")
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", 10000))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", 1.0))
+FSM_TTL = int(os.getenv("FSM_TTL", 7 * 24 * 3600))
+FSM_TEST_TTL = int(os.getenv("FSM_TEST_TTL", 6 * 3600))
+FSM_JANITOR_INTERVAL = float(os.getenv("FSM_JANITOR_INTERVAL", 600))
+SCORES_PARTITIONS_AHEAD = int(os.getenv("SCORES_PARTITIONS_AHEAD", 12))
+SCORES_RETENTION_YEARS = int(os.getenv("SCORES_RETENTION_YEARS", 2))
+SCHOOL_YEAR_START_MONTH = int(os.getenv("SCHOOL_YEAR_START_MONTH", 9))
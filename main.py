@@ -1,53 +1,174 @@
 import asyncio
 import logging
+import signal
+from typing import Optional
 
 import uvicorn
 from aiogram import Bot, Dispatcher
+from aiohttp import web
 
+from bot.bootstrap import create_bot, create_dispatcher, open_database, start_tracing
 from bot.handlers import setup_routers
+from bot.services import metrics
 from bot.services.database.connection import Database
-from bot.services.database.storage import PGStorage
+from bot.services.workers import WorkerPool, poll_updates
 from bot.utils import config
 from web.server import app
 
 
 async def main():
-    db = Database(config.DSN)
-    await db.connect()
-    storage = PGStorage(db.pool)
-    await storage.init_tables()
+    db = await open_database()
+    exporter = await start_tracing()
+    dp, pg_storage, listener = await create_dispatcher(db)
+    bot = create_bot()
 
-    bot = Bot(token=config.TOKEN)
-    dp = Dispatcher(storage=storage)
-    dp["db"] = db
-
-    dp.include_router(setup_routers())
-
-    web_server_task = asyncio.create_task(run_web_server())
+    # The web server uses the bot's pool instead of opening its own
+    app.state.db = db
+    app.state.dp = dp
+    app.state.bot = bot
+    web_server_task = start_web_server()
+    metrics_server = await start_metrics_server(web_server_task, db)
+    janitor_task = asyncio.create_task(
+        pg_storage.run_janitor(config.FSM_JANITOR_INTERVAL)
+    )
 
     try:
-        await dp.start_polling(bot)
+        if config.WEBHOOK_URL:
+            await run_webhook(dp, bot, web_server_task)
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     except Exception as e:
         logging.error(f"An error occurred: {e}")
     finally:
+        janitor_task.cancel()
+        await listener.close()
+        await dp["catalog"].close()
         await db.disconnect()
         logging.info("Database connection closed.")
+        if exporter is not None:
+            await exporter.close()
+
+        if web_server_task is not None:
+            web_server_task.cancel()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+
+
+async def main_sharded(workers: int):
+    """Receive updates in this process and handle them in worker processes."""
+    pool = WorkerPool(workers)
+    pool.start()
+    bot = create_bot()
+    routes = Dispatcher()
+    routes.include_router(setup_routers())
+    allowed_updates = routes.resolve_used_update_types()
+
+    # The webhook route hands updates to the pool instead of a dispatcher;
+    # the web server opens its own database
+    app.state.dp = pool
+    app.state.bot = bot
+    web_server_task = start_web_server()
+    # Only the launcher's own requests, the workers serve theirs
+    metrics_server = await start_metrics_server(web_server_task, None)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    if config.WEBHOOK_URL:
+        await set_webhook(bot, allowed_updates)
+        receiver_task = web_server_task
+    else:
+        await bot.delete_webhook()
+        receiver_task = asyncio.create_task(poll_updates(bot, pool, allowed_updates))
+
+    try:
+        await asyncio.wait(
+            [receiver_task, asyncio.create_task(stop.wait())],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    finally:
+        # Stop receiving first, so that the workers can drain their queues
+        receiver_task.cancel()
+        logging.info("Draining bot workers...")
+        await pool.close(config.WORKER_DRAIN_TIMEOUT)
+        if web_server_task is not None:
+            web_server_task.cancel()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        await bot.session.close()
+
+
+def check_webhook_config():
+    """Refuse to register a webhook the web server would reject."""
+    if config.WEBHOOK_URL and not config.WEBHOOK_SECRET:
+        raise RuntimeError(
+            "WEBHOOK_SECRET must be set when WEBHOOK_URL is, every webhook "
+            "delivery without it is rejected"
+        )
+
+
+async def set_webhook(bot: Bot, allowed_updates):
+    await bot.set_webhook(
+        config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+        secret_token=config.WEBHOOK_SECRET,
+        # Telegram accepts at most 100 connections per bot
+        max_connections=min(config.WEBHOOK_MAX_CONCURRENCY, 100),
+        allowed_updates=allowed_updates,
+    )
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, web_server_task: asyncio.Task):
+    """Receive updates through the web server until it stops."""
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    try:
+        await set_webhook(bot, dp.resolve_used_update_types())
+        logging.info("Receiving updates through the webhook...")
+        await web_server_task
+    finally:
+        # The webhook is left set, other replicas keep receiving updates
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await bot.session.close()
+
+
+async def start_metrics_server(
+    web_server_task: Optional[asyncio.Task], db: Optional[Database]
+) -> Optional[web.AppRunner]:
+    """Serve this process's metrics when the web app doesn't."""
+    if web_server_task is not None:
+        return None
+    return await metrics.start_server(db, config.METRICS_HOST, config.METRICS_PORT)
+
+
+def start_web_server() -> Optional[asyncio.Task]:
+    """Run the web app in this process, unless it runs as its own service.
 
-        web_server_task.cancel()
+    The webhook route is part of the web app, so it is always embedded in
+    webhook mode.
+    """
+    if not config.WEB_EMBEDDED and not config.WEBHOOK_URL:
+        return None
+    return asyncio.create_task(run_web_server())
 
 
 async def run_web_server():
     """Function to run the FastAPI server using uvicorn"""
     logging.info("Starting web server...")
     # Instead of using `uvicorn.run()`, you can use `await` here with the `Server`
-    config = uvicorn.Config(app, host="0.0.0.0", port=8000)
-    server = uvicorn.Server(config)
+    server_config = uvicorn.Config(app, host=config.WEB_HOST, port=config.WEB_PORT)
+    server = uvicorn.Server(server_config)
     await server.serve()
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
+    check_webhook_config()
     try:
-        asyncio.run(main())
+        if config.BOT_WORKERS > 1:
+            asyncio.run(main_sharded(config.BOT_WORKERS))
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("Exit")
@@ -0,0 +1,20 @@
+-- Restore separate state and data tables
+CREATE TABLE IF NOT EXISTS aiogram_states (
+  key TEXT PRIMARY KEY,
+  state TEXT
+);
+
+CREATE TABLE IF NOT EXISTS aiogram_data (
+  key TEXT PRIMARY KEY,
+  data JSONB
+);
+
+INSERT INTO aiogram_states (key, state)
+SELECT key, state FROM aiogram_fsm
+ON CONFLICT (key) DO NOTHING;
+
+INSERT INTO aiogram_data (key, data)
+SELECT key, data FROM aiogram_fsm
+ON CONFLICT (key) DO NOTHING;
+
+DROP TABLE IF EXISTS aiogram_fsm;
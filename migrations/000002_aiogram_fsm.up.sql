@@ -0,0 +1,24 @@
+-- Create combined FSM storage table, replacing aiogram_states and aiogram_data
+CREATE TABLE IF NOT EXISTS aiogram_fsm (
+  key TEXT PRIMARY KEY,
+  state TEXT,
+  data JSONB NOT NULL DEFAULT '{}',
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Move rows from the old tables created by PGStorage, skipping cleared ones
+DO $$
+BEGIN
+  IF to_regclass('aiogram_states') IS NOT NULL
+     AND to_regclass('aiogram_data') IS NOT NULL THEN
+    INSERT INTO aiogram_fsm (key, state, data)
+    SELECT COALESCE(s.key, d.key), s.state, COALESCE(d.data, '{}')
+    FROM aiogram_states s
+    FULL JOIN aiogram_data d ON d.key = s.key
+    WHERE s.state IS NOT NULL OR COALESCE(d.data, '{}') <> '{}'
+    ON CONFLICT (key) DO NOTHING;
+
+    DROP TABLE aiogram_states;
+    DROP TABLE aiogram_data;
+  END IF;
+END $$;
@@ -0,0 +1,31 @@
+-- Restore the str(StorageKey) text key
+CREATE TABLE aiogram_fsm_old (
+  key TEXT PRIMARY KEY,
+  state TEXT,
+  data JSONB NOT NULL DEFAULT '{}',
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO aiogram_fsm_old (key, state, data, updated_at)
+SELECT
+  format(
+    'StorageKey(bot_id=%s, chat_id=%s, user_id=%s, thread_id=%s, '
+    'business_connection_id=%s, destiny=%L)',
+    bot_id,
+    chat_id,
+    user_id,
+    CASE WHEN thread_id = 0 THEN 'None' ELSE thread_id::TEXT END,
+    CASE
+      WHEN business_connection_id = '' THEN 'None'
+      ELSE quote_literal(business_connection_id)
+    END,
+    destiny
+  ),
+  state,
+  data,
+  updated_at
+FROM aiogram_fsm;
+
+DROP TABLE aiogram_fsm;
+ALTER TABLE aiogram_fsm_old RENAME TO aiogram_fsm;
+ALTER INDEX aiogram_fsm_old_pkey RENAME TO aiogram_fsm_pkey;
@@ -0,0 +1,44 @@
+-- Replace the str(StorageKey) text key with typed key columns
+CREATE TABLE aiogram_fsm_new (
+  bot_id BIGINT NOT NULL,
+  chat_id BIGINT NOT NULL,
+  user_id BIGINT NOT NULL,
+  thread_id BIGINT NOT NULL DEFAULT 0,
+  business_connection_id TEXT NOT NULL DEFAULT '',
+  destiny TEXT NOT NULL DEFAULT 'default',
+  state TEXT,
+  data JSONB NOT NULL DEFAULT '{}',
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (bot_id, chat_id, user_id, thread_id, business_connection_id, destiny)
+);
+
+-- Keys look like:
+-- StorageKey(bot_id=1, chat_id=2, user_id=2, thread_id=None,
+--            business_connection_id=None, destiny='default')
+INSERT INTO aiogram_fsm_new (
+  bot_id, chat_id, user_id, thread_id, business_connection_id, destiny,
+  state, data, updated_at
+)
+SELECT
+  bot_id, chat_id, user_id, thread_id, business_connection_id, destiny,
+  state, data, updated_at
+FROM (
+  SELECT
+    substring(key FROM 'bot_id=(-?\d+)')::BIGINT AS bot_id,
+    substring(key FROM 'chat_id=(-?\d+)')::BIGINT AS chat_id,
+    substring(key FROM 'user_id=(-?\d+)')::BIGINT AS user_id,
+    COALESCE(substring(key FROM 'thread_id=(-?\d+)')::BIGINT, 0) AS thread_id,
+    COALESCE(substring(key FROM 'business_connection_id=''([^'']*)'''), '')
+      AS business_connection_id,
+    COALESCE(substring(key FROM 'destiny=''([^'']*)'''), 'default') AS destiny,
+    state,
+    data,
+    updated_at
+  FROM aiogram_fsm
+) parsed
+WHERE bot_id IS NOT NULL AND chat_id IS NOT NULL AND user_id IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+DROP TABLE aiogram_fsm;
+ALTER TABLE aiogram_fsm_new RENAME TO aiogram_fsm;
+ALTER INDEX aiogram_fsm_new_pkey RENAME TO aiogram_fsm_pkey;
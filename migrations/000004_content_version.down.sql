@@ -0,0 +1,2 @@
+ALTER TABLE quizzes DROP COLUMN IF EXISTS version;
+ALTER TABLE tests DROP COLUMN IF EXISTS version;
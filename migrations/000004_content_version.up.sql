@@ -0,0 +1,3 @@
+-- Add content version to tests and quizzes, bumped on every upload
+ALTER TABLE tests ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE quizzes ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1 @@
+DROP TABLE IF EXISTS student_best_scores;
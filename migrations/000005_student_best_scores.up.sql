@@ -0,0 +1,30 @@
+-- Create best score rollup, one row per student and test or quiz
+CREATE TABLE student_best_scores (
+  student_id BIGINT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  test_id INTEGER REFERENCES tests(id) ON DELETE CASCADE,
+  quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
+  score_id INTEGER NOT NULL,
+  score INTEGER NOT NULL,
+  completed_at TIMESTAMP NOT NULL,
+  CONSTRAINT best_score_target CHECK ((test_id IS NULL) <> (quiz_id IS NULL))
+);
+
+CREATE UNIQUE INDEX student_best_scores_test_key
+  ON student_best_scores (student_id, test_id) WHERE test_id IS NOT NULL;
+CREATE UNIQUE INDEX student_best_scores_quiz_key
+  ON student_best_scores (student_id, quiz_id) WHERE quiz_id IS NOT NULL;
+
+-- Backfill from existing attempts, latest attempt wins a tie
+INSERT INTO student_best_scores (student_id, test_id, score_id, score, completed_at)
+SELECT DISTINCT ON (student_id, test_id)
+  student_id, test_id, id, score, completed_at
+FROM student_scores
+WHERE test_id IS NOT NULL
+ORDER BY student_id, test_id, score DESC, completed_at DESC;
+
+INSERT INTO student_best_scores (student_id, quiz_id, score_id, score, completed_at)
+SELECT DISTINCT ON (student_id, quiz_id)
+  student_id, quiz_id, id, score, completed_at
+FROM student_scores
+WHERE quiz_id IS NOT NULL
+ORDER BY student_id, quiz_id, score DESC, completed_at DESC;
@@ -0,0 +1,9 @@
+DROP INDEX IF EXISTS student_best_scores_quiz_id_idx;
+DROP INDEX IF EXISTS student_best_scores_test_id_idx;
+DROP INDEX IF EXISTS student_scores_quiz_id_idx;
+DROP INDEX IF EXISTS student_scores_test_id_idx;
+DROP INDEX IF EXISTS student_scores_student_quiz_idx;
+DROP INDEX IF EXISTS student_scores_student_test_idx;
+DROP INDEX IF EXISTS materials_lesson_id_idx;
+DROP INDEX IF EXISTS lessons_topic_id_idx;
+DROP INDEX IF EXISTS topics_class_idx;
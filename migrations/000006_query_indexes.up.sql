@@ -0,0 +1,21 @@
+-- Catalog lookups by parent
+CREATE INDEX topics_class_idx ON topics (class);
+CREATE INDEX lessons_topic_id_idx ON lessons (topic_id);
+CREATE INDEX materials_lesson_id_idx ON materials (lesson_id);
+
+-- Attempts of a student, best first. The test index also covers lookups
+-- and cascading deletes by student_id alone.
+CREATE INDEX student_scores_student_test_idx
+  ON student_scores (student_id, test_id, score DESC);
+CREATE INDEX student_scores_student_quiz_idx
+  ON student_scores (student_id, quiz_id, score DESC) WHERE quiz_id IS NOT NULL;
+
+-- Cascading deletes of tests and quizzes
+CREATE INDEX student_scores_test_id_idx
+  ON student_scores (test_id) WHERE test_id IS NOT NULL;
+CREATE INDEX student_scores_quiz_id_idx
+  ON student_scores (quiz_id) WHERE quiz_id IS NOT NULL;
+CREATE INDEX student_best_scores_test_id_idx
+  ON student_best_scores (test_id) WHERE test_id IS NOT NULL;
+CREATE INDEX student_best_scores_quiz_id_idx
+  ON student_best_scores (quiz_id) WHERE quiz_id IS NOT NULL;
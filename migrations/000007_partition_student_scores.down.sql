@@ -0,0 +1,34 @@
+-- Attempts in archived partitions (schema scores_archive) are not restored
+ALTER TABLE student_scores RENAME TO student_scores_partitioned;
+ALTER INDEX student_scores_pkey RENAME TO student_scores_partitioned_pkey;
+ALTER TABLE student_scores_partitioned
+  DROP CONSTRAINT student_scores_student_id_fkey,
+  DROP CONSTRAINT student_scores_test_id_fkey,
+  DROP CONSTRAINT student_scores_quiz_id_fkey;
+DROP INDEX student_scores_student_test_idx;
+DROP INDEX student_scores_student_quiz_idx;
+DROP INDEX student_scores_test_id_idx;
+DROP INDEX student_scores_quiz_id_idx;
+
+CREATE TABLE student_scores (
+  id INTEGER PRIMARY KEY DEFAULT nextval('student_scores_id_seq'),
+  student_id BIGINT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  test_id INTEGER REFERENCES tests(id) ON DELETE CASCADE,
+  quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
+  score INTEGER NOT NULL,
+  completed_at TIMESTAMP NOT NULL
+);
+
+ALTER SEQUENCE student_scores_id_seq OWNED BY student_scores.id;
+
+INSERT INTO student_scores SELECT * FROM student_scores_partitioned;
+DROP TABLE student_scores_partitioned;
+
+CREATE INDEX student_scores_student_test_idx
+  ON student_scores (student_id, test_id, score DESC);
+CREATE INDEX student_scores_student_quiz_idx
+  ON student_scores (student_id, quiz_id, score DESC) WHERE quiz_id IS NOT NULL;
+CREATE INDEX student_scores_test_id_idx
+  ON student_scores (test_id) WHERE test_id IS NOT NULL;
+CREATE INDEX student_scores_quiz_id_idx
+  ON student_scores (quiz_id) WHERE quiz_id IS NOT NULL;
@@ -0,0 +1,59 @@
+-- Move the existing table aside
+ALTER TABLE student_scores RENAME TO student_scores_unpartitioned;
+ALTER INDEX student_scores_pkey RENAME TO student_scores_unpartitioned_pkey;
+ALTER TABLE student_scores_unpartitioned
+  DROP CONSTRAINT student_scores_student_id_fkey,
+  DROP CONSTRAINT student_scores_test_id_fkey,
+  DROP CONSTRAINT student_scores_quiz_id_fkey;
+
+-- Create student_scores partitioned by month of completion
+CREATE TABLE student_scores (
+  id INTEGER NOT NULL DEFAULT nextval('student_scores_id_seq'),
+  student_id BIGINT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  test_id INTEGER REFERENCES tests(id) ON DELETE CASCADE,
+  quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
+  score INTEGER NOT NULL,
+  completed_at TIMESTAMP NOT NULL,
+  PRIMARY KEY (id, completed_at)
+) PARTITION BY RANGE (completed_at);
+
+ALTER SEQUENCE student_scores_id_seq OWNED BY student_scores.id;
+
+-- Catches attempts outside of the monthly partitions until
+-- scripts/score_partitions.py creates them
+CREATE TABLE student_scores_default PARTITION OF student_scores DEFAULT;
+
+-- Create one partition per month from the first attempt to two months ahead
+DO $$
+DECLARE
+  month TIMESTAMP;
+BEGIN
+  FOR month IN
+    SELECT generate_series(
+      date_trunc('month', LEAST(MIN(completed_at), now()::timestamp)),
+      date_trunc('month', now()::timestamp) + interval '2 months',
+      interval '1 month'
+    )
+    FROM student_scores_unpartitioned
+  LOOP
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF student_scores FOR VALUES FROM (%L) TO (%L)',
+      'student_scores_p' || to_char(month, 'YYYYMM'),
+      month,
+      month + interval '1 month'
+    );
+  END LOOP;
+END $$;
+
+INSERT INTO student_scores SELECT * FROM student_scores_unpartitioned;
+DROP TABLE student_scores_unpartitioned;
+
+-- Recreate the indexes of 000006 on the partitioned table
+CREATE INDEX student_scores_student_test_idx
+  ON student_scores (student_id, test_id, score DESC);
+CREATE INDEX student_scores_student_quiz_idx
+  ON student_scores (student_id, quiz_id, score DESC) WHERE quiz_id IS NOT NULL;
+CREATE INDEX student_scores_test_id_idx
+  ON student_scores (test_id) WHERE test_id IS NOT NULL;
+CREATE INDEX student_scores_quiz_id_idx
+  ON student_scores (quiz_id) WHERE quiz_id IS NOT NULL;
@@ -0,0 +1,10 @@
+-- Topics whose quiz a student can take, filled by
+-- scripts/rebuild_eligible_quizzes.py and kept up to date on every score
+CREATE TABLE student_eligible_quizzes (
+  student_id BIGINT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  topic_id INTEGER NOT NULL REFERENCES topics(id) ON DELETE CASCADE,
+  PRIMARY KEY (student_id, topic_id)
+);
+
+CREATE INDEX student_eligible_quizzes_topic_id_idx
+  ON student_eligible_quizzes (topic_id);
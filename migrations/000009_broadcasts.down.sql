@@ -0,0 +1,2 @@
+DROP TABLE IF EXISTS broadcast_deliveries;
+DROP TABLE IF EXISTS broadcasts;
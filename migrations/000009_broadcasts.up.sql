@@ -0,0 +1,35 @@
+-- Messages sent by an admin to every student, or to the students of a class
+CREATE TABLE broadcasts (
+  id SERIAL PRIMARY KEY,
+  -- NULL sends to every student
+  class INTEGER,
+  -- The admin's message, copied to every recipient
+  from_chat_id BIGINT NOT NULL,
+  message_id BIGINT NOT NULL,
+  created_by BIGINT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  status TEXT NOT NULL DEFAULT 'running'
+    CHECK (status IN ('running', 'done', 'cancelled')),
+  -- Recipients are paged by id, every id up to this one has been handled
+  last_student_id BIGINT NOT NULL DEFAULT 0,
+  sent INTEGER NOT NULL DEFAULT 0,
+  failed INTEGER NOT NULL DEFAULT 0,
+  -- Set by the process delivering the broadcast and renewed on every page,
+  -- another process takes over once it has passed
+  claimed_until TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX broadcasts_running_idx ON broadcasts (id) WHERE status = 'running';
+
+CREATE TABLE broadcast_deliveries (
+  broadcast_id INTEGER NOT NULL REFERENCES broadcasts(id) ON DELETE CASCADE,
+  student_id BIGINT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+  status TEXT NOT NULL CHECK (status IN ('sent', 'blocked', 'failed')),
+  error TEXT,
+  delivered_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (broadcast_id, student_id)
+);
+
+CREATE INDEX broadcast_deliveries_student_id_idx
+  ON broadcast_deliveries (student_id);
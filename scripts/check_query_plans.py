@@ -0,0 +1,344 @@
+"""Check that repository queries do not scan large tables sequentially.
+
+Seeds the database with a realistic amount of data, runs every repository
+query, EXPLAINs it and exits with status 1 when a plan contains a
+sequential scan over one of LARGE_TABLES. Everything happens in a single
+transaction that is rolled back, so it can be pointed at any database with
+the migrations applied:
+
+    python -m scripts.check_query_plans
+"""
+
+import asyncio
+import json
+import sys
+from typing import Dict, List, Set, Tuple, Union
+
+import asyncpg
+
+from bot.services.database.connection import Query
+from bot.services.database.models import QuizData, TestData
+from bot.services.database.repositories.broadcasts import BroadcastRepository
+from bot.services.database.repositories.lessons import LessonRepository
+from bot.services.database.repositories.quizzes import QuizRepository
+from bot.services.database.repositories.students import StudentRepository
+from bot.services.database.repositories.tests import TestRepository
+from bot.services.database.repositories.topics import TopicRepository
+from bot.utils import config
+from web.server import get_student_scores
+
+# Tables that grow with the number of students or the size of the curriculum
+LARGE_TABLES = {
+    "students",
+    "student_scores",
+    "student_best_scores",
+    "lessons",
+    "materials",
+    "broadcast_deliveries",
+}
+
+# Tables a query is expected to read in full, by query label
+ALLOWED_SEQ_SCANS: Dict[str, Set[str]] = {
+    # Recomputes the eligible quizzes of every student
+    "QuizRepository.refresh_eligible_topics": {"students"},
+    # Finds the students of a class once per page, from the tests of its lessons
+    "BroadcastRepository.get_recipients": {"lessons"},
+}
+
+SEED_CLASSES = 11
+SEED_TOPICS_PER_CLASS = 20
+SEED_LESSONS_PER_TOPIC = 10
+SEED_MATERIALS_PER_LESSON = 3
+SEED_QUESTIONS = 10
+SEED_STUDENTS = 5000
+SEED_ATTEMPTS_PER_STUDENT = 40
+# Seeded student ids are kept out of the range of Telegram user ids
+SEED_STUDENT_ID = 10**15
+
+SEED_CATALOG_QUERY = """
+    WITH new_topics AS (
+        INSERT INTO topics (title, description, class)
+        SELECT 'Topic ' || n, '', 1 + n % $1::int
+        FROM generate_series(1, $1::int * $2::int) n
+        RETURNING id
+    ), new_lessons AS (
+        INSERT INTO lessons (title, description, topic_id)
+        SELECT 'Lesson ' || n, '', t.id
+        FROM new_topics t, generate_series(1, $3::int) n
+        RETURNING id
+    ), new_materials AS (
+        INSERT INTO materials (lesson_id, file_id, type)
+        SELECT l.id, 'file-' || l.id || '-' || n, 'document'
+        FROM new_lessons l, generate_series(1, $4::int) n
+    ), new_tests AS (
+        INSERT INTO tests (lesson_id, test_data)
+        SELECT id, $5::jsonb FROM new_lessons
+    )
+    INSERT INTO quizzes (topic_id, test_data)
+    SELECT id, $5::jsonb FROM new_topics
+"""
+
+SEED_SCORES_QUERY = """
+    WITH new_students AS (
+        INSERT INTO students (id, name, username)
+        SELECT $1::bigint + n, 'Student ' || n, 'seed_student_' || n
+        FROM generate_series(1, $2::int) n
+        RETURNING id
+    ), all_tests AS (
+        SELECT id, row_number() OVER (ORDER BY id) AS n, count(*) OVER () AS total
+        FROM tests
+    ), attempts AS (
+        INSERT INTO student_scores (student_id, test_id, score, completed_at)
+        SELECT s.id, t.id, (random() * 100)::int,
+               now() - random() * interval '365 days'
+        FROM new_students s
+        CROSS JOIN generate_series(1, $3::int) a
+        JOIN all_tests t ON t.n = 1 + (s.id + a * 7919) % t.total
+        RETURNING id, student_id, test_id, score, completed_at
+    )
+    INSERT INTO student_best_scores (
+        student_id, test_id, score_id, score, completed_at
+    )
+    SELECT DISTINCT ON (student_id, test_id)
+        student_id, test_id, id, score, completed_at
+    FROM attempts
+    ORDER BY student_id, test_id, score DESC, completed_at DESC
+"""
+
+
+class ExplainingDatabase:
+    """Database stand-in that runs queries on a single connection and
+    records the plan of each one under the current label."""
+
+    def __init__(self, conn: asyncpg.Connection):
+        self.conn = conn
+        self.label = ""
+        self.plans: List[Tuple[str, str, dict]] = []
+
+    async def _explain(self, query: Union[str, Query], args: tuple) -> tuple:
+        """EXPLAIN a query and return its SQL and record class."""
+        if isinstance(query, Query):
+            sql, record_class = query.sql, query.record_class
+        else:
+            sql, record_class = query, None
+        plan = await self.conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *args)
+        self.plans.append((self.label, sql, json.loads(plan)[0]["Plan"]))
+        return sql, record_class
+
+    async def execute(self, query: Union[str, Query], *args):
+        sql, _ = await self._explain(query, args)
+        return await self.conn.execute(sql, *args)
+
+    async def fetch(self, query: Union[str, Query], *args):
+        sql, record_class = await self._explain(query, args)
+        return await self.conn.fetch(sql, *args, record_class=record_class)
+
+    async def fetchrow(self, query: Union[str, Query], *args):
+        sql, record_class = await self._explain(query, args)
+        return await self.conn.fetchrow(sql, *args, record_class=record_class)
+
+    async def fetchval(self, query: Union[str, Query], *args):
+        sql, _ = await self._explain(query, args)
+        return await self.conn.fetchval(sql, *args)
+
+
+def seq_scans(plan: dict, parents: Dict[str, str]) -> Set[str]:
+    """Names of the tables scanned sequentially anywhere in a plan.
+
+    A scan of a partition is reported as a scan of its partitioned table.
+    """
+    found = set()
+    if plan["Node Type"] == "Seq Scan":
+        name = plan["Relation Name"]
+        found.add(parents.get(name, name))
+    for child in plan.get("Plans", []):
+        found |= seq_scans(child, parents)
+    return found
+
+
+async def partition_parents(conn: asyncpg.Connection) -> Dict[str, str]:
+    rows = await conn.fetch(
+        """
+        SELECT c.relname AS partition, p.relname AS parent
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relkind = 'p'
+        """
+    )
+    return {row["partition"]: row["parent"] for row in rows}
+
+
+def sample_test() -> TestData:
+    return TestData.model_validate(
+        {
+            "questions": [
+                {
+                    "question": f"Question {n}",
+                    "options": ["a", "b", "c"],
+                    "correct_answer": 0,
+                }
+                for n in range(SEED_QUESTIONS)
+            ]
+        }
+    )
+
+
+async def seed(conn: asyncpg.Connection):
+    await conn.execute(
+        SEED_CATALOG_QUERY,
+        SEED_CLASSES,
+        SEED_TOPICS_PER_CLASS,
+        SEED_LESSONS_PER_TOPIC,
+        SEED_MATERIALS_PER_LESSON,
+        sample_test().model_dump_json(),
+    )
+    await conn.execute(
+        SEED_SCORES_QUERY, SEED_STUDENT_ID, SEED_STUDENTS, SEED_ATTEMPTS_PER_STUDENT
+    )
+    await conn.execute("ANALYZE")
+
+
+async def run_queries(db: ExplainingDatabase):
+    """Call every repository method once, on seeded rows."""
+    student_id = SEED_STUDENT_ID + 1
+    topic_id, class_number = await db.conn.fetchrow(
+        "SELECT id, class FROM topics ORDER BY id DESC LIMIT 1"
+    )
+    lesson_id = await db.conn.fetchval(
+        "SELECT max(id) FROM lessons WHERE topic_id = $1", topic_id
+    )
+    min_score = config.MIN_PASS_SCORE
+    test_data = sample_test()
+    quiz_data = QuizData.model_validate(test_data.model_dump())
+    broadcast_id = await db.conn.fetchval(
+        """
+        INSERT INTO broadcasts (class, from_chat_id, message_id, created_by)
+        VALUES ($1, $2, 1, $2)
+        RETURNING id
+        """,
+        class_number,
+        student_id,
+    )
+
+    students = StudentRepository(db)
+    topics = TopicRepository(db)
+    lessons = LessonRepository(db)
+    tests = TestRepository(db)
+    quizzes = QuizRepository(db)
+    broadcasts = BroadcastRepository(db)
+
+    calls = {
+        "StudentRepository.add_student": lambda: students.add_student(
+            SEED_STUDENT_ID, "Student", "seed_student"
+        ),
+        "StudentRepository.get_student": lambda: students.get_student(student_id),
+        "TopicRepository.add_topic": lambda: topics.add_topic(
+            "Topic", "", class_number
+        ),
+        "TopicRepository.get_topic": lambda: topics.get_topic(topic_id),
+        "TopicRepository.get_topics_by_class": lambda: topics.get_topics_by_class(
+            class_number
+        ),
+        "LessonRepository.add_lesson": lambda: lessons.add_lesson(
+            "Lesson", "", topic_id
+        ),
+        "LessonRepository.get_lessson": lambda: lessons.get_lessson(lesson_id),
+        "LessonRepository.get_class_by_lesson": lambda: lessons.get_class_by_lesson(
+            lesson_id
+        ),
+        "LessonRepository.get_lessons_by_topic": lambda: lessons.get_lessons_by_topic(
+            topic_id
+        ),
+        "LessonRepository.add_material": lambda: lessons.add_material(
+            lesson_id, "file", "document"
+        ),
+        "LessonRepository.get_materials": lambda: lessons.get_materials(lesson_id),
+        "TestRepository.get_test": lambda: tests.get_test(lesson_id),
+        "TestRepository.get_test_entry": lambda: tests.get_test_entry(lesson_id),
+        "TestRepository.add_test": lambda: tests.add_test(lesson_id, test_data),
+        "TestRepository.complete_test": lambda: tests.complete_test(
+            student_id, lesson_id, 95, min_score
+        ),
+        "TestRepository.get_student_highest_score": lambda: (
+            tests.get_student_highest_score(student_id, lesson_id)
+        ),
+        "QuizRepository.get_quiz": lambda: quizzes.get_quiz(topic_id),
+        "QuizRepository.get_quiz_entry": lambda: quizzes.get_quiz_entry(topic_id),
+        "QuizRepository.add_quiz": lambda: quizzes.add_quiz(topic_id, quiz_data),
+        "QuizRepository.save_student_score": lambda: quizzes.save_student_score(
+            student_id, topic_id, 90
+        ),
+        "QuizRepository.get_eligible_topics": lambda: quizzes.get_eligible_topics(
+            student_id
+        ),
+        "QuizRepository.refresh_eligible_topics": lambda: (
+            quizzes.refresh_eligible_topics(min_score, topic_id)
+        ),
+        "QuizRepository.get_student_highest_score": lambda: (
+            quizzes.get_student_highest_score(student_id, topic_id)
+        ),
+        "web.get_student_scores": lambda: get_student_scores(student_id, db=db),
+        "BroadcastRepository.add_broadcast": lambda: broadcasts.add_broadcast(
+            None, student_id, 1, student_id
+        ),
+        "BroadcastRepository.get_broadcasts": lambda: broadcasts.get_broadcasts(),
+        "BroadcastRepository.claim_broadcast": lambda: broadcasts.claim_broadcast(60),
+        "BroadcastRepository.get_recipients": lambda: broadcasts.get_recipients(
+            class_number, student_id, 100
+        ),
+        "BroadcastRepository.save_page": lambda: broadcasts.save_page(
+            broadcast_id, [student_id], ["sent"], [None], 60
+        ),
+        "BroadcastRepository.renew_broadcast": lambda: broadcasts.renew_broadcast(
+            broadcast_id, 60
+        ),
+        "BroadcastRepository.release_broadcast": lambda: (
+            broadcasts.release_broadcast(broadcast_id)
+        ),
+        "BroadcastRepository.finish_broadcast": lambda: broadcasts.finish_broadcast(
+            broadcast_id
+        ),
+        "BroadcastRepository.cancel_broadcast": lambda: broadcasts.cancel_broadcast(
+            broadcast_id
+        ),
+        "LessonRepository.delete_materials": lambda: lessons.delete_materials(
+            lesson_id
+        ),
+        "LessonRepository.delete_lesson": lambda: lessons.delete_lesson(lesson_id),
+        "TopicRepository.delete_topic": lambda: topics.delete_topic(topic_id),
+    }
+    for label, call in calls.items():
+        db.label = label
+        await call()
+
+
+async def main() -> int:
+    conn = await asyncpg.connect(config.DSN)
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        await seed(conn)
+        parents = await partition_parents(conn)
+        db = ExplainingDatabase(conn)
+        await run_queries(db)
+    finally:
+        await transaction.rollback()
+        await conn.close()
+
+    failed = False
+    for label, query, plan in db.plans:
+        tables = (seq_scans(plan, parents) & LARGE_TABLES) - ALLOWED_SEQ_SCANS.get(
+            label, set()
+        )
+        if tables:
+            failed = True
+            print(f"FAIL {label}: sequential scan on {', '.join(sorted(tables))}")
+            print(query)
+        else:
+            print(f"ok   {label}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -9,5 +9,11 @@ done
 echo "Running database migrations..."
 migrate -path migrations -database "${DATABASE_URL}" up
 
+echo "Creating score partitions..."
+python -m scripts.score_partitions ensure
+
+echo "Rebuilding eligible quizzes..."
+python -m scripts.rebuild_eligible_quizzes
+
 echo "Starting bot..."
 python main.py
\ No newline at end of file
@@ -0,0 +1,29 @@
+"""Recompute student_eligible_quizzes for every student and topic.
+
+Scores and registrations keep the set up to date on their own. Run this
+after editing the curriculum outside of the bot or changing MIN_PASS_SCORE:
+
+    python -m scripts.rebuild_eligible_quizzes
+"""
+
+import asyncio
+import logging
+
+from bot.services.database.connection import Database
+from bot.services.database.repositories.quizzes import QuizRepository
+from bot.utils import config
+
+
+async def main():
+    db = Database(config.DSN)
+    await db.connect()
+    try:
+        await QuizRepository(db).refresh_eligible_topics(config.MIN_PASS_SCORE)
+        logging.info("Eligible quizzes rebuilt.")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""Maintain the monthly partitions of student_scores.
+
+    python -m scripts.score_partitions ensure [--months N]
+        Create partitions for the current month and N months ahead and
+        move matching attempts out of the default partition.
+
+    python -m scripts.score_partitions archive [--years N]
+        Detach partitions older than the last N school years and move
+        them to the scores_archive schema.
+
+Best scores are kept in student_best_scores, so archiving old attempts
+does not change the results or quiz eligibility of any student.
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date
+from typing import List
+
+import asyncpg
+
+from bot.utils import config
+
+PARTITION_PREFIX = "student_scores_p"
+ARCHIVE_SCHEMA = "scores_archive"
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def school_year_start(today: date, start_month: int) -> date:
+    year = today.year if today.month >= start_month else today.year - 1
+    return date(year, start_month, 1)
+
+
+async def list_partitions(conn: asyncpg.Connection) -> List[date]:
+    """Months of the monthly partitions attached to student_scores."""
+    rows = await conn.fetch(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'student_scores'::regclass
+        """
+    )
+    months = []
+    for row in rows:
+        match = re.fullmatch(rf"{PARTITION_PREFIX}(\d{{4}})(\d{{2}})", row["relname"])
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+async def create_partition(conn: asyncpg.Connection, month: date):
+    name = partition_name(month)
+    start, end = month, add_months(month, 1)
+    async with conn.transaction():
+        await conn.execute(
+            f"CREATE TABLE {name} (LIKE student_scores INCLUDING DEFAULTS)"
+        )
+        # Attaching fails while the default partition holds rows in range
+        await conn.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM student_scores_default
+                WHERE completed_at >= $1 AND completed_at < $2
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            start,
+            end,
+        )
+        await conn.execute(
+            f"""
+            ALTER TABLE student_scores ATTACH PARTITION {name}
+            FOR VALUES FROM ('{start}') TO ('{end}')
+            """
+        )
+    logging.info(f"Created partition {name}.")
+
+
+async def ensure(conn: asyncpg.Connection, months_ahead: int):
+    existing = set(await list_partitions(conn))
+    current = date.today().replace(day=1)
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            await create_partition(conn, month)
+
+
+async def archive(conn: asyncpg.Connection, keep_years: int):
+    if keep_years < 1:
+        raise ValueError("At least the current school year has to be kept")
+
+    start = school_year_start(date.today(), config.SCHOOL_YEAR_START_MONTH)
+    cutoff = start.replace(year=start.year - keep_years + 1)
+
+    await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+    for month in await list_partitions(conn):
+        if add_months(month, 1) > cutoff:
+            continue
+        name = partition_name(month)
+        async with conn.transaction():
+            await conn.execute(f"ALTER TABLE student_scores DETACH PARTITION {name}")
+            await conn.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+        logging.info(f"Archived partition {name}.")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure_parser = commands.add_parser("ensure")
+    ensure_parser.add_argument(
+        "--months", type=int, default=config.SCORES_PARTITIONS_AHEAD
+    )
+    archive_parser = commands.add_parser("archive")
+    archive_parser.add_argument(
+        "--years", type=int, default=config.SCORES_RETENTION_YEARS
+    )
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(config.DSN)
+    try:
+        if args.command == "ensure":
+            await ensure(conn, args.months)
+        else:
+            await archive(conn, args.years)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,20 @@
+"""Run the web app as its own service, with several worker processes:
+
+    python -m web
+
+Each worker opens a database pool of WEB_DB_POOL_MIN_SIZE to
+WEB_DB_POOL_MAX_SIZE connections. Set WEB_EMBEDDED=0 for the bot so that
+it does not serve the app as well.
+"""
+
+import uvicorn
+
+from bot.utils import config
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "web.server:app",
+        host=config.WEB_HOST,
+        port=config.WEB_PORT,
+        workers=config.WEB_WORKERS,
+    )
@@ -1,25 +1,70 @@
+import asyncio
+import hmac
+import logging
 import os
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set
 
-from fastapi import Depends, FastAPI, HTTPException
+from aiogram.types import Update
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
-from bot.services.database.connection import Database
+from bot.services import metrics
+from bot.services.database.connection import Database, named_query
 from bot.utils import config
 
 
 async def lifespan(app: FastAPI):
-    app.state.db = Database(config.DSN)
-    await app.state.db.connect()
+    # When the bot runs the server in-process it shares its own database,
+    # otherwise every web worker opens a pool sized for the web alone
+    owns_db = not hasattr(app.state, "db")
+    if owns_db:
+        app.state.db = Database(
+            config.DSN,
+            min_size=config.WEB_DB_POOL_MIN_SIZE,
+            max_size=config.WEB_DB_POOL_MAX_SIZE,
+            acquire_timeout=config.DB_ACQUIRE_TIMEOUT,
+            slow_query_threshold=config.SLOW_QUERY_THRESHOLD,
+        )
+        await app.state.db.connect()
+    # Updates being handled at most at once, further deliveries wait for a
+    # slot. Created here so that it belongs to the server's event loop
+    app.state.webhook_slots = asyncio.Semaphore(config.WEBHOOK_MAX_CONCURRENCY)
     yield
-    await app.state.db.disconnect()
+    # Telegram won't deliver acknowledged updates again, so they are handled
+    # before the bot shuts down
+    if webhook_tasks:
+        logging.info(f"Waiting for {len(webhook_tasks)} webhook updates...")
+        _, pending = await asyncio.wait(
+            set(webhook_tasks), timeout=config.WEBHOOK_DRAIN_TIMEOUT
+        )
+        if pending:
+            logging.warning(f"Shutting down with {len(pending)} updates unhandled")
+    if owns_db:
+        await app.state.db.disconnect()
 
 
 app = FastAPI(lifespan=lifespan)
 
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route templates keep the label set small, the static mount has none
+        route = getattr(request.scope.get("route"), "path", "") or "static"
+        metrics.WEB_SECONDS.observe(
+            time.perf_counter() - start, request.method, route, str(status)
+        )
+
+
 class Score(BaseModel):
     id: int
     score: int
@@ -62,185 +107,160 @@ def get_db():
     return app.state.db
 
 
-@app.get("/students/{student_id}/scores", response_model=StudentScoresResponse)
-async def get_student_scores(student_id: int, db: Database = Depends(get_db)):
-    async with db.pool.acquire() as connection:
-        student = await connection.fetchrow(
-            "SELECT id, name, username FROM students WHERE id = $1", student_id
-        )
-        if not student:
-            raise HTTPException(status_code=404, detail="Student not found")
-
-
-        lesson_scores = await connection.fetch(
-            """
-            WITH RankedLessonScores AS (
-                SELECT 
-                    tp.class,
-                    tp.id AS topic_id, 
-                    tp.title AS topic_title, 
-                    l.id AS lesson_id, 
-                    l.title AS lesson_title, 
-                    ss.id AS score_id, 
-                    ss.score, 
-                    ss.completed_at,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY l.id
-                        ORDER BY ss.score DESC, ss.completed_at DESC
-                    ) as rank
-                FROM student_scores ss
-                JOIN tests ts ON ss.test_id = ts.id
-                JOIN lessons l ON ts.lesson_id = l.id
-                JOIN topics tp ON l.topic_id = tp.id
-                WHERE ss.student_id = $1
-            )
-            SELECT *
-            FROM RankedLessonScores
-            WHERE rank = 1
-            """,
-            student_id,
+STUDENT_SCORES = named_query(
+    "web.student_scores",
+    """
+    WITH lesson_scores AS (
+        SELECT
+            ts.lesson_id,
+            b.score_id,
+            b.score,
+            b.completed_at
+        FROM student_best_scores b
+        JOIN tests ts ON b.test_id = ts.id
+        WHERE b.student_id = $1
+    ),
+    quiz_scores AS (
+        SELECT
+            q.topic_id,
+            b.score_id,
+            b.score,
+            b.completed_at
+        FROM student_best_scores b
+        JOIN quizzes q ON b.quiz_id = q.id
+        WHERE b.student_id = $1
+    ),
+    topic_lessons AS (
+        SELECT
+            l.topic_id,
+            json_agg(
+                json_build_object(
+                    'lesson_id', l.id,
+                    'title', l.title,
+                    'score', json_build_object(
+                        'id', ls.score_id,
+                        'score', ls.score,
+                        'completed_at', ls.completed_at
+                    )
+                )
+                ORDER BY l.id
+            ) AS lessons
+        FROM lesson_scores ls
+        JOIN lessons l ON ls.lesson_id = l.id
+        GROUP BY l.topic_id
+    ),
+    class_topics AS (
+        SELECT
+            tp.class,
+            json_agg(
+                json_build_object(
+                    'topic_id', tp.id,
+                    'title', tp.title,
+                    'lessons', COALESCE(tl.lessons, '[]'::json),
+                    'quiz_score', CASE WHEN qs.score_id IS NOT NULL THEN
+                        json_build_object(
+                            'id', qs.score_id,
+                            'score', qs.score,
+                            'completed_at', qs.completed_at
+                        )
+                    END
+                )
+                ORDER BY tp.id
+            ) AS topics
+        FROM topics tp
+        LEFT JOIN topic_lessons tl ON tl.topic_id = tp.id
+        LEFT JOIN quiz_scores qs ON qs.topic_id = tp.id
+        WHERE tl.topic_id IS NOT NULL OR qs.topic_id IS NOT NULL
+        GROUP BY tp.class
+    )
+    SELECT json_build_object(
+        'student_id', s.id,
+        'name', s.name,
+        'username', s.username,
+        'classes', COALESCE(
+            (
+                SELECT json_agg(
+                    json_build_object(
+                        'class_number', ct.class,
+                        'topics', ct.topics
+                    )
+                    ORDER BY ct.class
+                )
+                FROM class_topics ct
+            ),
+            '[]'::json
         )
+    )::text
+    FROM students s
+    WHERE s.id = $1
+""",
+)
 
 
-        quiz_scores = await connection.fetch(
-            """
-            WITH RankedQuizScores AS (
-                SELECT 
-                    tp.class,
-                    tp.id AS topic_id, 
-                    tp.title AS topic_title, 
-                    ss.id AS score_id, 
-                    ss.score, 
-                    ss.completed_at,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY q.topic_id
-                        ORDER BY ss.score DESC, ss.completed_at DESC
-                    ) as rank
-                FROM student_scores ss
-                JOIN quizzes q ON ss.quiz_id = q.id
-                JOIN topics tp ON q.topic_id = tp.id
-                WHERE ss.student_id = $1
-            )
-            SELECT *
-            FROM RankedQuizScores
-            WHERE rank = 1
-            """,
-            student_id,
-        )
+@app.get("/students/{student_id}/scores", response_model=StudentScoresResponse)
+async def get_student_scores(student_id: int, db: Database = Depends(get_db)):
+    # The whole response is built by Postgres and passed through unchanged
+    payload = await db.fetchval(STUDENT_SCORES, student_id)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Student not found")
 
+    return Response(content=payload, media_type="application/json")
 
-        classes = {}
-
-
-        for row in lesson_scores:
-            class_number = row["class"]
-            topic_id = row["topic_id"]
-            topic_title = row["topic_title"]
-            lesson_id = row["lesson_id"]
-            lesson_title = row["lesson_title"]
-            score_id = row["score_id"]
-            score_val = row["score"]
-            completed_at = (
-                row["completed_at"].isoformat() if row["completed_at"] else None
-            )
-
-            if class_number not in classes:
-                classes[class_number] = {}
-            class_data = classes[class_number]
-
-            if topic_id not in class_data:
-                class_data[topic_id] = {
-                    "title": topic_title,
-                    "lessons": {},
-                    "quiz_score": None,
-                }
-            topic_data = class_data[topic_id]
-
-
-            if lesson_id not in topic_data["lessons"]:
-                topic_data["lessons"][lesson_id] = {
-                    "lesson_id": lesson_id,
-                    "title": lesson_title,
-                    "score": None,
-                }
-            lesson_data = topic_data["lessons"][lesson_id]
-
-
-            lesson_data["score"] = {
-                "id": score_id,
-                "score": score_val,
-                "completed_at": completed_at,
-            }
-
-
-        for row in quiz_scores:
-            class_number = row["class"]
-            topic_id = row["topic_id"]
-            topic_title = row["topic_title"]
-            score_id = row["score_id"]
-            score_val = row["score"]
-            completed_at = (
-                row["completed_at"].isoformat() if row["completed_at"] else None
-            )
-
-            if class_number not in classes:
-                classes[class_number] = {}
-            class_data = classes[class_number]
-
-            if topic_id not in class_data:
-                class_data[topic_id] = {
-                    "title": topic_title,
-                    "lessons": {},
-                    "quiz_score": None,
-                }
-            topic_data = class_data[topic_id]
-
-            topic_data["quiz_score"] = {
-                "id": score_id,
-                "score": score_val,
-                "completed_at": completed_at,
-            }
-
-
-        student_scores = StudentScoresResponse(
-            student_id=student["id"],
-            name=student["name"],
-            username=student["username"],
-            classes=[],
-        )
 
-        for class_number in sorted(classes.keys()):
-            class_details = ClassDetails(class_number=class_number, topics=[])
-
-            for topic_id, topic_info in sorted(classes[class_number].items()):
-
-                lessons = []
-                for lesson_id, lesson_info in sorted(topic_info["lessons"].items()):
-                    if lesson_info["score"]:
-                        lesson_score = Score(**lesson_info["score"])
-                        lessons.append(
-                            LessonDetails(
-                                lesson_id=lesson_id,
-                                title=lesson_info["title"],
-                                score=lesson_score,
-                            )
-                        )
+webhook_tasks: Set[asyncio.Task] = set()
 
-                quiz_score = None
-                if topic_info["quiz_score"]:
-                    quiz_score = Score(**topic_info["quiz_score"])
 
-                topic_details = TopicDetails(
-                    topic_id=topic_id,
-                    title=topic_info["title"],
-                    lessons=lessons,
-                    quiz_score=quiz_score,
-                )
-                class_details.topics.append(topic_details)
+async def handle_update(update: Update):
+    try:
+        await app.state.dp.feed_update(app.state.bot, update)
+    except Exception as e:
+        logging.error(f"Failed to handle update {update.update_id}: {e}")
+    finally:
+        app.state.webhook_slots.release()
 
-            student_scores.classes.append(class_details)
 
-        return student_scores
+@app.post(config.WEBHOOK_PATH, include_in_schema=False)
+async def telegram_webhook(request: Request):
+    secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not config.WEBHOOK_SECRET or not hmac.compare_digest(
+        secret, config.WEBHOOK_SECRET
+    ):
+        raise HTTPException(status_code=401, detail="Invalid secret token")
+    if not hasattr(app.state, "dp"):
+        raise HTTPException(status_code=503, detail="Bot is not running")
+
+    try:
+        update = Update.model_validate(
+            await request.json(), context={"bot": app.state.bot}
+        )
+    except (ValueError, ValidationError) as e:
+        # Telegram would retry the same payload forever, so drop it
+        logging.error(f"Dropped a malformed webhook update: {e}")
+        return Response(status_code=200)
+    await app.state.webhook_slots.acquire()
+    # Telegram only needs to know the update arrived, answers are sent
+    # through the Bot API while handling it
+    task = asyncio.create_task(handle_update(update))
+    webhook_tasks.add(task)
+    task.add_done_callback(webhook_tasks.discard)
+    return Response(status_code=200)
+
+
+@app.get("/metrics")
+async def get_metrics(db: Database = Depends(get_db)):
+    return Response(content=metrics.render(db), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/pool")
+async def get_pool_metrics(db: Database = Depends(get_db)):
+    return db.pool_metrics()
+
+
+@app.get("/metrics/queries")
+async def get_query_metrics(db: Database = Depends(get_db)):
+    # Slowest queries in total first
+    metrics = db.query_metrics()
+    return dict(sorted(metrics.items(), key=lambda item: -item[1]["seconds_total"]))
 
 
 static_directory = os.path.join(os.path.dirname(__file__), "static")